@@ -0,0 +1,301 @@
+"""Audio analysis for audio-reactive effects.
+
+The uploaded MP3/WAV is decoded once with ffmpeg to mono float PCM and
+analysed per video frame with vectorized NumPy: a log-frequency STFT
+magnitude spectrum (one row of bar heights per frame), an RMS loudness
+envelope, a spectral-flux onset curve and a beat grid estimated from the
+onset autocorrelation. Results are cached by the SHA-256 of the audio bytes,
+so changing the effect or the intensity never re-analyses the same track.
+When the track is already on disk, ffmpeg reads the file itself rather than
+being fed a copy of it.
+
+Decoding streams: ffmpeg's PCM is read in fixed-size blocks and turned into
+frame-aligned analysis windows a batch of frames at a time, so only the
+small per-frame results grow with the track and a ten-minute mix takes no
+more working memory than a ten-second clip.
+"""
+import hashlib
+import os
+import re
+import subprocess
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from media_tools import find_ffmpeg
+
+SAMPLE_RATE = 22050
+FFT_SIZE = 2048
+SPECTRUM_BANDS = 48
+MIN_FREQ = 30.0
+MAX_FREQ = 11000.0
+# Dynamic range mapped onto bar heights 0..1
+SPECTRUM_DB_RANGE = 60.0
+MIN_BPM = 60.0
+MAX_BPM = 180.0
+# Number of analysed tracks kept in memory
+CACHE_SIZE = 16
+# PCM read from ffmpeg at a time, and video frames analysed per batch
+DECODE_BLOCK_SECONDS = 10
+ANALYSIS_BATCH_FRAMES = 512
+# Bytes written to ffmpeg's stdin at a time
+FEED_CHUNK_BYTES = 1024 * 1024
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def audio_hash(audio_bytes):
+    return hashlib.sha256(audio_bytes).hexdigest()
+
+
+def stream_samples(source, sample_rate=SAMPLE_RATE, block_seconds=DECODE_BLOCK_SECONDS):
+    """Decode MP3/WAV to mono float32, yielded in blocks of block_seconds
+
+    source is the audio bytes, fed to ffmpeg's stdin, or the path of an
+    audio file, which ffmpeg opens itself.
+    """
+    from_file = isinstance(source, (str, os.PathLike))
+    cmd = [
+        find_ffmpeg(), "-loglevel", "error", "-i", os.fspath(source) if from_file else "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1",
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL if from_file else subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = []
+
+    def feed():
+        data = memoryview(source).cast("B")
+        try:
+            for offset in range(0, len(data), FEED_CHUNK_BYTES):
+                proc.stdin.write(data[offset:offset + FEED_CHUNK_BYTES])
+            proc.stdin.close()
+        except (BrokenPipeError, ValueError):
+            # ffmpeg stopped reading; its exit status says why
+            pass
+
+    # Feeding stdin and draining stderr off this thread keeps ffmpeg from
+    # blocking on a full pipe while we read its output
+    threads = [threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)]
+    if not from_file:
+        threads.append(threading.Thread(target=feed, daemon=True))
+    for thread in threads:
+        thread.start()
+    block_bytes = max(1, int(block_seconds * sample_rate)) * 4
+    finished = False
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data, dtype=np.float32)
+        finished = True
+    finally:
+        if not finished and proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        for thread in threads:
+            thread.join()
+    if proc.returncode != 0:
+        message = (stderr[0] if stderr else b"").decode(errors="replace").strip()
+        raise RuntimeError(f"Could not decode audio: {message}")
+
+
+def probe_duration(path):
+    """Length of an audio file in seconds from its header, without decoding it"""
+    result = subprocess.run([find_ffmpeg(), "-hide_banner", "-i", path], capture_output=True)
+    # ffmpeg exits non-zero without an output file but still prints the input info
+    match = re.search(rb"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        raise RuntimeError("Could not read the audio duration")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def frame_windows(blocks, sample_rate, fps, size, batch=ANALYSIS_BATCH_FRAMES):
+    """Yield (frames, size) matrices of analysis windows centred on each video frame
+
+    blocks is any iterable of sample arrays; only the samples upcoming
+    windows still reach are kept. The generator's return value is the
+    total number of samples read.
+    """
+    half = size // 2
+    offsets = np.arange(size)[None, :]
+    # buffer[i] is sample start + i; before the track is silence, like the padding after it
+    buffer = np.zeros(half, dtype=np.float32)
+    start = -half
+    frame = 0
+    total = 0
+    last = None
+
+    def centre(k):
+        return int(np.round(k * sample_rate / fps))
+
+    blocks = iter(blocks)
+    while last is None:
+        block = next(blocks, None)
+        if block is None:
+            last = max(1, int(np.ceil(total / sample_rate * fps)))
+            block = np.zeros(size, dtype=np.float32)
+        else:
+            total += len(block)
+        buffer = np.concatenate([buffer, block.astype(np.float32, copy=False)])
+
+        # Frames whose whole window is buffered
+        stop = frame
+        while (last is None or stop < last) and centre(stop) + half <= start + len(buffer):
+            stop += 1
+        for first in range(frame, stop, batch):
+            centres = np.round(np.arange(first, min(first + batch, stop)) * sample_rate / fps)
+            yield buffer[centres.astype(np.intp)[:, None] - half - start + offsets]
+        frame = stop
+
+        # At low frame rates windows may not overlap, so never skip past the buffer
+        keep_from = min(centre(frame) - half, start + len(buffer))
+        if keep_from > start:
+            buffer = buffer[keep_from - start:]
+            start = keep_from
+    return total
+
+
+def _band_edges(sample_rate, size, bands):
+    """FFT bin edges of log-spaced frequency bands"""
+    freqs = np.geomspace(MIN_FREQ, min(MAX_FREQ, sample_rate / 2), bands + 1)
+    edges = np.maximum(np.round(freqs * size / sample_rate).astype(np.intp), 1)
+    # Every band gets at least one bin
+    edges = np.maximum(edges, np.arange(bands + 1) + edges[0])
+    return np.minimum(edges, size // 2)
+
+
+def _normalize(values):
+    peak = values.max() if len(values) else 0.0
+    return (values / peak).astype(np.float32) if peak > 0 else np.zeros_like(values, dtype=np.float32)
+
+
+def _beat_grid(onset, fps):
+    """Estimate tempo and beat phase from the onset curve; returns (bpm, beat frames)"""
+    if len(onset) < 4:
+        return 0.0, np.zeros(0)
+    centred = onset - onset.mean()
+    size = 1 << int(np.ceil(np.log2(2 * len(centred))))
+    spectrum = np.fft.rfft(centred, size)
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum), size)[:len(centred)]
+
+    min_lag = max(1, int(fps * 60.0 / MAX_BPM))
+    max_lag = min(len(autocorr) - 1, int(fps * 60.0 / MIN_BPM))
+    if max_lag <= min_lag:
+        return 0.0, np.zeros(0)
+    lag = min_lag + int(np.argmax(autocorr[min_lag:max_lag + 1]))
+
+    # Pick the phase whose grid collects the most onset energy
+    phases = np.arange(lag)
+    beats = phases[:, None] + lag * np.arange(len(onset) // lag + 1)[None, :]
+    valid = beats < len(onset)
+    score = np.where(valid, onset[np.minimum(beats, len(onset) - 1)], 0.0).sum(axis=1)
+    phase = int(np.argmax(score))
+    return 60.0 * fps / lag, np.arange(phase, len(onset), lag)
+
+
+def beat_pulse(beat_frames, frame_count):
+    """Envelope that spikes on each beat frame and decays until the next"""
+    if len(beat_frames) == 0:
+        return np.zeros(frame_count, dtype=np.float32)
+    frames = np.arange(frame_count)
+    last = np.searchsorted(beat_frames, frames, side="right") - 1
+    spacing = np.diff(beat_frames).mean() if len(beat_frames) > 1 else frame_count
+    since = np.where(last >= 0, frames - beat_frames[np.maximum(last, 0)], spacing)
+    return np.exp(-6.0 * since / spacing).astype(np.float32)
+
+
+def analyze_stream(blocks, sample_rate, fps, bands=SPECTRUM_BANDS):
+    """Per-frame spectrum, RMS, onsets and beat grid for a stream of sample blocks"""
+    hop = max(1, int(sample_rate / fps))
+    centre = FFT_SIZE // 2
+    edges = _band_edges(sample_rate, FFT_SIZE, bands)
+    hann = np.hanning(FFT_SIZE).astype(np.float32)
+    rms_parts, band_parts, flux_parts = [], [], []
+    previous = None
+
+    windows_batches = frame_windows(blocks, sample_rate, fps, FFT_SIZE)
+    while True:
+        try:
+            windows = next(windows_batches)
+        except StopIteration as done:
+            total = done.value
+            break
+        rms_parts.append(np.sqrt(np.mean(
+            np.square(windows[:, centre - hop // 2:centre + hop - hop // 2]), axis=1
+        )))
+        magnitude = np.abs(np.fft.rfft(windows * hann, axis=1))
+        summed = np.cumsum(magnitude, axis=1)
+        band_parts.append(((summed[:, edges[1:] - 1] - summed[:, edges[:-1] - 1])
+                           / (edges[1:] - edges[:-1])).astype(np.float32))
+        log_magnitude = np.log1p(magnitude)
+        # The first frame of the track has nothing before it to differ from
+        prepend = log_magnitude[:1] if previous is None else previous
+        flux_parts.append(np.maximum(np.diff(log_magnitude, axis=0, prepend=prepend), 0.0).sum(axis=1))
+        previous = log_magnitude[-1:]
+
+    band_energy = np.concatenate(band_parts)
+    db = 20.0 * np.log10(band_energy + 1e-9)
+    levels = np.clip((db - (db.max() - SPECTRUM_DB_RANGE)) / SPECTRUM_DB_RANGE, 0.0, 1.0)
+    onset = _normalize(np.concatenate(flux_parts))
+
+    tempo, beats = _beat_grid(onset, fps)
+    rms = _normalize(np.concatenate(rms_parts))
+    envelope = beat_pulse(beats, len(onset)) * (0.4 + 0.6 * rms)
+    return {
+        "fps": fps,
+        "duration": total / sample_rate,
+        "spectrum": levels.astype(np.float32),
+        "rms": rms,
+        "onset": onset,
+        "tempo": tempo,
+        "beats": beats,
+        "envelope": envelope.astype(np.float32),
+    }
+
+
+def analyze_samples(samples, sample_rate, fps, bands=SPECTRUM_BANDS):
+    """Per-frame spectrum, RMS, onsets and beat grid for decoded samples"""
+    return analyze_stream([samples], sample_rate, fps, bands)
+
+
+def _analysis_bytes(analysis):
+    return sum(value.nbytes for value in analysis.values() if isinstance(value, np.ndarray))
+
+
+def cached_bytes(key):
+    """Bytes of cached analyses of the audio with this SHA-256, at any frame rate"""
+    with _cache_lock:
+        return sum(_analysis_bytes(analysis) for (digest, _), analysis in _cache.items()
+                   if digest == key)
+
+
+def discard(key):
+    """Forget every cached analysis of the audio with this SHA-256; returns the bytes freed"""
+    with _cache_lock:
+        keys = [k for k in _cache if k[0] == key]
+        return sum(_analysis_bytes(_cache.pop(k)) for k in keys)
+
+
+def analyze_audio(audio_bytes, fps, path=None):
+    """Analyse uploaded audio, reusing the cached result for identical bytes
+
+    path, if given, is a file holding the same bytes, such as the media
+    store's copy of the upload; ffmpeg then decodes it directly.
+    """
+    key = (audio_hash(audio_bytes), fps)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    analysis = analyze_stream(stream_samples(path or audio_bytes), SAMPLE_RATE, fps)
+    with _cache_lock:
+        _cache[key] = analysis
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return analysis
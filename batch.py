@@ -0,0 +1,248 @@
+"""Headless batch mode: turn a folder of tracks and covers into videos.
+
+Usage:
+    python batch.py manifest.csv [--report results.json] [--size 720p]
+                                 [--outputs video,short,thumbnail] [--no-upload]
+
+The manifest is a CSV (or a JSON list of objects) with one row per video.
+Columns: ``image``, ``audio``, ``effect`` and ``title`` are required;
+``description``, ``tags``, ``intensity``, ``duration``, ``sync_to_audio``,
+``text_overlay`` and ``privacy`` are optional. Relative paths are resolved
+against the manifest's directory. ``duration`` is in seconds, or ``full``
+for the whole track; a video is never made longer than its audio.
+
+``--outputs`` picks what each row renders in its single pass: the 16:9
+``video`` plus optionally a 9:16 ``short`` and a ``thumbnail``; only the
+video is uploaded.
+
+Rows go through the same render, SEO and upload stages as the web app
+(see pipeline.py). Each row runs as its own small driver, and the stages
+have their own worker pools, so while one row renders the next one is
+already generating SEO and an earlier one is uploading. Renders are spread
+over every core by the render farm. OPENAI_API_KEY and YOUTUBE_TOKEN are
+read from the environment; without them SEO falls back to sample content
+and uploads run in demo mode.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_analysis import probe_duration
+from effects import EFFECT_RENDERERS
+from encoders import DEFAULT_PRESET, SHARDABLE_PRESETS
+from pipeline import (
+    POLL_SECONDS, UPLOAD_WORKERS, create_job_queue, render_job, seo_job, upload_job,
+)
+from render_farm import RenderFarm
+from renderer import (
+    DEFAULT_FPS, DEFAULT_OUTPUTS, DEFAULT_SIZE, OUTPUT_SIZES, ladder_sizes,
+)
+
+DEFAULT_INTENSITY = 50
+DEFAULT_DURATION = 15
+
+
+def _flag(value, default=True):
+    if value in (None, ""):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def _duration(value, number):
+    """Seconds from a manifest cell; None means the whole track"""
+    if value in (None, ""):
+        return DEFAULT_DURATION
+    if str(value).strip().lower() == "full":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Manifest row {number}: duration must be seconds or 'full'") from None
+
+
+def track_duration(row):
+    """The row's duration in seconds, cut to (or set to) the length of its audio"""
+    track = round(probe_duration(row["audio"]), 2)
+    return track if row["duration"] is None else min(row["duration"], track)
+
+
+def load_manifest(path):
+    """Rows of the manifest as dicts with paths made absolute and defaults filled in"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+        else:
+            rows = list(csv.DictReader(f))
+
+    base = os.path.dirname(os.path.abspath(path))
+    manifest = []
+    for number, row in enumerate(rows, 1):
+        row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+        for column in ("image", "audio", "effect", "title"):
+            if not row.get(column):
+                raise ValueError(f"Manifest row {number}: missing '{column}'")
+        if row["effect"] not in EFFECT_RENDERERS:
+            raise ValueError(f"Manifest row {number}: unknown effect '{row['effect']}' "
+                             f"(choose from {', '.join(EFFECT_RENDERERS)})")
+        manifest.append({
+            "row": number,
+            "image": os.path.join(base, row["image"]),
+            "audio": os.path.join(base, row["audio"]),
+            "effect": row["effect"],
+            "title": row["title"],
+            "description": row.get("description") or "",
+            "tags": row.get("tags") or "",
+            "intensity": int(row.get("intensity") or DEFAULT_INTENSITY),
+            "duration": _duration(row.get("duration"), number),
+            "sync_to_audio": _flag(row.get("sync_to_audio")),
+            "text_overlay": row.get("text_overlay") or "",
+            "privacy": row.get("privacy") or "private",
+        })
+    return manifest
+
+
+def wait_for(queue, job_id, on_poll=None):
+    """Block until a job finishes; returns its record, raising if it did not succeed
+
+    on_poll, if given, is called on every poll while the job is unfinished.
+    """
+    while True:
+        job = queue.status(job_id)
+        if job is None:
+            raise RuntimeError("Background job was lost")
+        if job["state"] == "done":
+            return job
+        if job["state"] in ("failed", "cancelled"):
+            raise RuntimeError(job["error"] or job["state"])
+        if on_poll:
+            on_poll()
+        time.sleep(POLL_SECONDS)
+
+
+def process_row(queue, row, size, fps, preset, upload, api_key, token, outputs=DEFAULT_OUTPUTS):
+    """Drive one manifest row through render, SEO and upload; returns its report entry"""
+    result = {"row": row["row"], "image": row["image"], "audio": row["audio"],
+              "effect": row["effect"], "state": "failed", "error": None}
+    started = time.monotonic()
+    try:
+        with open(row["image"], "rb") as f:
+            image_bytes = f.read()
+        with open(row["audio"], "rb") as f:
+            audio_bytes = f.read()
+
+        duration = track_duration(row)
+        result["duration"] = duration
+
+        # Render and SEO are independent, so both are queued straight away
+        render_params, key = render_job(
+            image_bytes, audio_bytes, row["effect"], row["intensity"], duration,
+            row["sync_to_audio"], row["text_overlay"], size=size, fps=fps, preset=preset,
+            outputs=outputs, audio_path=row["audio"],
+        )
+        rendering = queue.submit("render", render_params, key=key)
+        seo_params, key = seo_job(row["title"], row["description"], api_key)
+        generating = queue.submit("seo", seo_params, key=key)
+        del image_bytes, audio_bytes, render_params
+
+        seo = wait_for(queue, generating)["result"]
+        result.update(title=seo["title"], description=seo["description"],
+                      tags=", ".join(t for t in (row["tags"], seo["tags"]) if t))
+        render = wait_for(queue, rendering)["result"]
+        result.update(video_path=render["video_path"], outputs=render.get("outputs"),
+                      cached=render["cached"])
+
+        if upload:
+            params, key = upload_job(render["video_path"], result["title"], result["description"],
+                                     result["tags"], row["privacy"], token)
+            uploaded = wait_for(queue, queue.submit("upload", params, key=key, reuse_done=True))["result"]
+            result.update(video_id=uploaded["video_id"], url=uploaded["url"])
+        result["state"] = "done"
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.monotonic() - started, 2)
+    return result
+
+
+def run_batch(manifest, size=DEFAULT_SIZE, fps=DEFAULT_FPS, preset=DEFAULT_PRESET, upload=True,
+              in_flight=None, jobs_db=None, progress=None, outputs=DEFAULT_OUTPUTS):
+    """Process every manifest row and return the report entries in manifest order"""
+    api_key = os.getenv("OPENAI_API_KEY")
+    token = os.getenv("YOUTUBE_TOKEN")
+    farm = RenderFarm()
+    queue = create_job_queue(farm, jobs_db)
+    # Enough rows in flight to keep every render slot busy while others upload
+    in_flight = in_flight or farm.max_jobs + UPLOAD_WORKERS
+    results = []
+    try:
+        with ThreadPoolExecutor(in_flight, thread_name_prefix="batch-row") as pool:
+            futures = [pool.submit(process_row, queue, row, size, fps, preset, upload, api_key, token,
+                                   outputs)
+                       for row in manifest]
+            for future in futures:
+                results.append(future.result())
+                if progress:
+                    progress(results[-1])
+    finally:
+        farm.shutdown()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render, describe and upload a batch of videos.")
+    parser.add_argument("manifest", help="CSV or JSON manifest of image/audio/effect/title rows")
+    parser.add_argument("--report", help="Where to write the JSON results (default: next to the manifest)")
+    parser.add_argument("--size", default=DEFAULT_SIZE, choices=sorted(OUTPUT_SIZES))
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS)
+    parser.add_argument("--preset", default=DEFAULT_PRESET, choices=SHARDABLE_PRESETS,
+                        help="Encoder preset")
+    parser.add_argument("--outputs", default=",".join(DEFAULT_OUTPUTS),
+                        help="Comma-separated outputs rendered in one pass: video, short, thumbnail")
+    parser.add_argument("--jobs", type=int, help="Rows processed concurrently")
+    parser.add_argument("--jobs-db", help="SQLite job database to use")
+    parser.add_argument("--no-upload", action="store_true", help="Stop after rendering and SEO")
+    args = parser.parse_args(argv)
+
+    outputs = tuple(name.strip() for name in args.outputs.split(",") if name.strip())
+    try:
+        ladder_sizes(args.size, outputs)
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    report_path = args.report or os.path.splitext(args.manifest)[0] + ".results.json"
+
+    def show(entry):
+        detail = entry.get("url") or entry.get("video_path") if entry["state"] == "done" else entry["error"]
+        print(f"[{entry['row']}/{len(manifest)}] {entry['state']} in {entry['seconds']}s: {detail}",
+              flush=True)
+
+    started = time.monotonic()
+    results = run_batch(manifest, args.size, args.fps, args.preset, upload=not args.no_upload,
+                        in_flight=args.jobs, jobs_db=args.jobs_db, progress=show, outputs=outputs)
+    elapsed = time.monotonic() - started
+    done = sum(1 for entry in results if entry["state"] == "done")
+
+    report = {
+        "manifest": os.path.abspath(args.manifest),
+        "size": args.size,
+        "fps": args.fps,
+        "preset": args.preset,
+        "outputs": list(outputs),
+        "seconds": round(elapsed, 2),
+        "done": done,
+        "failed": len(results) - done,
+        "jobs": results,
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"{done}/{len(results)} videos done in {elapsed:.1f}s; report written to {report_path}")
+    return 0 if done == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
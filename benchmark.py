@@ -0,0 +1,215 @@
+"""Render benchmark suite.
+
+Renders every effect in ``effects.EFFECT_RENDERERS`` at several output
+sizes and clip lengths from synthetic fixtures (a generated cover image and
+a generated drum-and-tone track), so it runs offline on any CPU-only box
+with ffmpeg. For each case it reports:
+
+- effect_fps: frames per second of the NumPy effect alone
+- fps: frames per second of the full render (effect + ffmpeg encode)
+- encode_seconds / encode_fps: wall time of the same render not spent
+  computing effects, per preset
+- peak_rss_mb / encoder_peak_rss_mb: peak memory of the render process and ffmpeg
+
+Each case runs in a fresh process so peak memory is per case. Results are
+written as JSON and compared against a stored baseline; a case whose fps
+dropped by more than the threshold is a regression and makes the run exit
+non-zero.
+
+Usage:
+    python benchmark.py [--sizes 480p 720p] [--durations 2 6] [--effects glitch zoom]
+                        [--presets draft fast quality]
+                        [--output benchmark_results.json] [--baseline benchmark_baseline.json]
+                        [--threshold 0.15] [--update-baseline]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from audio_analysis import SAMPLE_RATE, analyze_samples
+from effects import EFFECT_RENDERERS
+from encoders import DEFAULT_PRESET, PRESETS
+from image_ingest import letterbox
+from renderer import DEFAULT_FPS, OUTPUT_SIZES, build_context, encode_frames
+
+DEFAULT_SIZES = ["480p", "720p", "1080p"]
+DEFAULT_DURATIONS = [2, 6]
+DEFAULT_THRESHOLD = 0.15
+BASELINE_PATH = "benchmark_baseline.json"
+RESULTS_PATH = "benchmark_results.json"
+FIXTURE_BPM = 120
+
+
+def synthetic_image(width=1600, height=1600):
+    """Colourful gradient with rings, so every effect has edges and hues to work on"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    r = np.hypot(x - width / 2, y - height / 2)
+    pixels = np.stack([
+        x / width * 255,
+        y / height * 255,
+        (np.sin(r / 24) * 0.5 + 0.5) * 255,
+    ], axis=-1)
+    return Image.fromarray(pixels.astype(np.uint8))
+
+
+def synthetic_audio(duration, sample_rate=SAMPLE_RATE, bpm=FIXTURE_BPM):
+    """Mono float32 track: a kick on every beat, hi-hats between, and a chord pad"""
+    t = np.arange(int(duration * sample_rate), dtype=np.float32) / sample_rate
+    beat = 60.0 / bpm
+    since_beat = t % beat
+    kick = np.sin(2 * np.pi * 55 * since_beat) * np.exp(-since_beat * 18)
+    since_hat = (t + beat / 2) % beat
+    rng = np.random.default_rng(0)
+    hat = rng.standard_normal(len(t)).astype(np.float32) * np.exp(-since_hat * 60) * 0.3
+    pad = sum(np.sin(2 * np.pi * f * t) for f in (220.0, 277.2, 329.6)) * 0.1
+    return (0.6 * kick + hat + pad).astype(np.float32)
+
+
+def run_case(effect_id, size, duration, fps, preset=DEFAULT_PRESET, intensity=70):
+    """Benchmark one effect/size/duration/preset in the current process"""
+    canvas = letterbox(synthetic_image(), OUTPUT_SIZES[size])
+    analysis = analyze_samples(synthetic_audio(duration), SAMPLE_RATE, fps)
+    ctx = build_context(effect_id, intensity, duration, fps, True, analysis=analysis)
+    frames = ctx["frame_count"]
+
+    # One pass: the renderer times the effect batches as the encoder pulls them
+    timings = {}
+    workdir = tempfile.mkdtemp(prefix="youassist_bench_")
+    try:
+        output = os.path.join(workdir, "bench.mp4")
+        encode_frames(canvas, effect_id, ctx, output, timings=timings, preset=preset)
+        effect_seconds = timings["effects"]
+        render_seconds = timings["total"]
+        encode_seconds = render_seconds - effect_seconds
+        output_bytes = os.path.getsize(output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # ru_maxrss is in KiB on Linux
+    return {
+        "effect": effect_id,
+        "size": size,
+        "duration": duration,
+        "preset": preset,
+        "fps_target": fps,
+        "frames": frames,
+        "effect_fps": round(frames / effect_seconds, 2),
+        "fps": round(frames / render_seconds, 2),
+        "render_seconds": round(render_seconds, 3),
+        "encode_seconds": round(encode_seconds, 3),
+        "encode_fps": round(frames / encode_seconds, 2) if encode_seconds else None,
+        "output_bytes": output_bytes,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "encoder_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def _case_entry(args):
+    return run_case(*args)
+
+
+def case_name(case):
+    return f"{case['effect']}/{case['size']}/{case['duration']:g}s/{case.get('preset', DEFAULT_PRESET)}"
+
+
+def run_suite(effects, sizes, durations, fps=DEFAULT_FPS, presets=(DEFAULT_PRESET,),
+              progress=None):
+    """Run every combination, each in a fresh worker process, one at a time"""
+    cases = [(effect_id, size, duration, fps, preset) for effect_id in effects
+             for size in sizes for duration in durations for preset in presets]
+    results = []
+    # One case per process so peak RSS is not inherited from earlier cases,
+    # and one process at a time so cases do not compete for cores
+    pool = multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1)
+    try:
+        for result in pool.imap(_case_entry, cases):
+            results.append(result)
+            if progress:
+                progress(result)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Cases whose fps fell more than threshold below the baseline"""
+    reference = {case_name(case): case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results:
+        base = reference.get(case_name(case))
+        if not base or not base.get("fps"):
+            continue
+        change = case["fps"] / base["fps"] - 1
+        case["baseline_fps"] = base["fps"]
+        case["change"] = round(change, 3)
+        if change < -threshold:
+            regressions.append(case)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every render effect.")
+    parser.add_argument("--effects", nargs="+", default=list(EFFECT_RENDERERS),
+                        choices=list(EFFECT_RENDERERS))
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, choices=list(OUTPUT_SIZES))
+    parser.add_argument("--durations", nargs="+", type=float, default=DEFAULT_DURATIONS,
+                        help="Clip lengths in seconds")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS)
+    parser.add_argument("--presets", nargs="+", default=[DEFAULT_PRESET], choices=list(PRESETS),
+                        help="Encoder presets to measure")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline results to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed fractional fps drop before a case counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    def show(case):
+        print(f"{case_name(case):36s} {case['fps']:8.1f} fps  effect {case['effect_fps']:8.1f} fps  "
+              f"encode {case['encode_seconds']:6.2f}s  rss {case['peak_rss_mb']:7.1f} MB", flush=True)
+
+    results = run_suite(args.effects, args.sizes, args.durations, args.fps, args.presets,
+                        progress=show)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor(), "cpus": os.cpu_count()},
+        "threshold": args.threshold,
+        "cases": results,
+    }
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report["regressions"] = [case_name(case) for case in regressions]
+        for case in regressions:
+            print(f"REGRESSION {case_name(case)}: {case['fps']} fps vs {case['baseline_fps']} baseline "
+                  f"({case['change']:+.0%})")
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+    elif not args.update_baseline:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""Video encoder backends and presets.
+
+Frames leave the effects as packed uint8 RGB arrays and are handed to an
+encoder unchanged: the RGB -> YUV 4:2:0 conversion happens inside the
+encoder (libswscale), never per frame in Python. Two interchangeable
+backends are available:
+
+- ``ffmpeg``: an ffmpeg subprocess fed raw frames through a pipe (default)
+- ``pyav``: libav in-process through PyAV, used when ``av`` is installed and
+  selected with YOUASSIST_ENCODER=pyav (or ``auto``); it writes video-only
+  files, so renders that mux audio always use ffmpeg
+
+Presets trade speed for quality and follow YouTube's recommended upload
+settings (H.264 High profile, closed GOP of half the frame rate, two
+B-frames, 4:2:0, moov atom first). ``draft`` is for quick previews of a
+render and ``two_pass`` encodes at YouTube's recommended bitrate in two
+passes over the frames. Several encoders can be fed from the same frames,
+so one render produces every output format in a single pass.
+
+``two_pass`` computes the frames twice, once per pass, and its first pass
+only sees the frames of the range being encoded. Spooling raw frames for
+the second pass would take gigabytes of disk per minute of 1080p, so
+instead the preset is kept out of sharded renders: the render farm cuts
+clips into 2 s shards, whose bitrate budget would be planned blind to the
+rest of the clip. It is for single-process encodes such as the benchmark;
+``SHARDABLE_PRESETS`` lists the presets the farm accepts.
+"""
+import importlib.util
+import os
+import shutil
+import subprocess
+import tempfile
+
+from media_tools import find_ffmpeg
+
+ENCODER_BACKEND = os.getenv("YOUASSIST_ENCODER", "ffmpeg")
+# Encoder threads; 0 lets the encoder pick
+ENCODER_THREADS = int(os.getenv("YOUASSIST_ENCODER_THREADS", "0"))
+DEFAULT_PRESET = os.getenv("YOUASSIST_ENCODER_PRESET", "fast")
+
+PRESETS = {
+    "draft": {"x264": "ultrafast", "crf": 30, "youtube": False},
+    "fast": {"x264": "veryfast", "crf": 23, "youtube": True},
+    "balanced": {"x264": "medium", "crf": 20, "youtube": True},
+    "quality": {"x264": "slow", "crf": 18, "youtube": True},
+    "two_pass": {"x264": "medium", "two_pass": True, "youtube": True},
+}
+SHARDABLE_PRESETS = [name for name, settings in PRESETS.items() if not settings.get("two_pass")]
+# YouTube's recommended SDR video bitrates (kbit/s) by frame height at up to 30 fps
+YOUTUBE_BITRATES = {480: 2500, 720: 5000, 1080: 8000}
+AUDIO_ARGS = ["-c:a", "aac", "-b:a", "384k", "-ar", "48000"]
+# Largest single write into the encoder pipe
+PIPE_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def youtube_bitrate(size, fps):
+    """Target video bitrate in kbit/s for two-pass encodes"""
+    height = min(size)
+    rate = next((r for h, r in sorted(YOUTUBE_BITRATES.items()) if height <= h),
+                max(YOUTUBE_BITRATES.values()))
+    return rate * 3 // 2 if fps > 30 else rate
+
+
+def video_args(preset, size, fps, threads=ENCODER_THREADS):
+    """libx264 options for a preset"""
+    settings = PRESETS[preset]
+    args = ["-c:v", "libx264", "-preset", settings["x264"], "-pix_fmt", "yuv420p",
+            "-threads", str(threads)]
+    if settings.get("two_pass"):
+        args += ["-b:v", f"{youtube_bitrate(size, fps)}k"]
+    else:
+        args += ["-crf", str(settings["crf"])]
+    if settings["youtube"]:
+        args += ["-profile:v", "high", "-bf", "2", "-g", str(max(1, fps // 2)), "-flags", "+cgop"]
+    return args
+
+
+def pyav_available():
+    return importlib.util.find_spec("av") is not None
+
+
+class FFmpegEncoder:
+    """ffmpeg subprocess reading raw rgb24 frames from its stdin"""
+
+    name = "ffmpeg"
+
+    def __init__(self, output_path, size, fps, preset=DEFAULT_PRESET, threads=ENCODER_THREADS,
+                 audio_path=None, duration=None, pass_args=()):
+        width, height = size
+        cmd = [
+            find_ffmpeg(), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "pipe:0",
+        ]
+        if audio_path:
+            cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a"] + AUDIO_ARGS
+            if duration:
+                cmd += ["-t", str(duration)]
+        cmd += video_args(preset, size, fps, threads) + list(pass_args)
+        if output_path == os.devnull:
+            cmd += ["-an", "-f", "null", "-"]
+        else:
+            cmd += ["-movflags", "+faststart", output_path]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frames):
+        """Encode a (N, H, W, 3) uint8 batch"""
+        data = memoryview(frames).cast("B")
+        try:
+            for offset in range(0, len(data), PIPE_CHUNK_BYTES):
+                self._proc.stdin.write(data[offset:offset + PIPE_CHUNK_BYTES])
+        except BrokenPipeError:
+            # ffmpeg exited early; close() reports why
+            pass
+
+    def close(self):
+        """Flush the encoder; raises RuntimeError if ffmpeg failed"""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = self._proc.stderr.read()
+        self._proc.wait()
+        if self._proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+
+class PyAVEncoder:
+    """libx264 through PyAV in this process (video only)"""
+
+    name = "pyav"
+
+    def __init__(self, output_path, size, fps, preset=DEFAULT_PRESET, threads=ENCODER_THREADS):
+        import av
+
+        settings = PRESETS[preset]
+        self._container = av.open(output_path, "w", options={"movflags": "+faststart"})
+        stream = self._container.add_stream("libx264", rate=fps)
+        stream.width, stream.height = size
+        stream.pix_fmt = "yuv420p"
+        options = {"preset": settings["x264"], "crf": str(settings.get("crf", 23))}
+        if settings["youtube"]:
+            options.update({"profile": "high", "bf": "2", "g": str(max(1, fps // 2)), "flags": "+cgop"})
+        stream.options = options
+        stream.codec_context.thread_count = threads
+        self._stream = stream
+        self._from_ndarray = av.VideoFrame.from_ndarray
+
+    def write(self, frames):
+        for frame in frames:
+            for packet in self._stream.encode(self._from_ndarray(frame, format="rgb24")):
+                self._container.mux(packet)
+
+    def close(self):
+        for packet in self._stream.encode():
+            self._container.mux(packet)
+        self._container.close()
+
+
+def open_encoder(output_path, size, fps, preset=DEFAULT_PRESET, threads=ENCODER_THREADS,
+                 audio_path=None, duration=None, backend=None):
+    """Encoder for the configured backend; anything PyAV cannot do falls back to ffmpeg"""
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown encoder preset: {preset}")
+    backend = backend or ENCODER_BACKEND
+    use_pyav = backend in ("pyav", "auto") and not audio_path and pyav_available()
+    if use_pyav and not PRESETS[preset].get("two_pass"):
+        return PyAVEncoder(output_path, size, fps, preset, threads)
+    return FFmpegEncoder(output_path, size, fps, preset, threads, audio_path, duration)
+
+
+def encode_outputs(make_batches, outputs, fps, preset=DEFAULT_PRESET, threads=ENCODER_THREADS,
+                   audio_path=None, duration=None, backend=None, on_batch=None):
+    """Encode several outputs from one stream of batches
+
+    outputs maps a name to its (output path, size) and make_batches yields
+    (frame indices, {name: frames}), so every encoder is fed from the same
+    pass over the frames. Two-pass presets make two such passes, each
+    feeding all the encoders, so make_batches computes every frame twice.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown encoder preset: {preset}")
+    if PRESETS[preset].get("two_pass"):
+        passdir = tempfile.mkdtemp(prefix="youassist_pass_")
+        try:
+            logs = {name: os.path.join(passdir, f"x264_{n}") for n, name in enumerate(outputs)}
+            _feed(_open_all(outputs, lambda name, path, size: FFmpegEncoder(
+                os.devnull, size, fps, preset, threads,
+                pass_args=["-pass", "1", "-passlogfile", logs[name]],
+            )), make_batches(), None)
+            _feed(_open_all(outputs, lambda name, path, size: FFmpegEncoder(
+                path, size, fps, preset, threads, audio_path, duration,
+                pass_args=["-pass", "2", "-passlogfile", logs[name]],
+            )), make_batches(), on_batch)
+        finally:
+            shutil.rmtree(passdir, ignore_errors=True)
+        return outputs
+
+    _feed(_open_all(outputs, lambda name, path, size: open_encoder(
+        path, size, fps, preset, threads, audio_path, duration, backend,
+    )), make_batches(), on_batch)
+    return outputs
+
+
+def _open_all(outputs, opener):
+    encoders = {}
+    try:
+        for name, (path, size) in outputs.items():
+            encoders[name] = opener(name, path, size)
+    except Exception:
+        for encoder in encoders.values():
+            try:
+                encoder.close()
+            except Exception:
+                pass
+        raise
+    return encoders
+
+
+def _feed(encoders, batches, on_batch):
+    try:
+        for idx, frames in batches:
+            for name, encoder in encoders.items():
+                encoder.write(frames[name])
+            if on_batch:
+                on_batch(idx)
+    finally:
+        errors = []
+        for encoder in encoders.values():
+            try:
+                encoder.close()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
@@ -0,0 +1,111 @@
+"""Shared HTTP client for external APIs.
+
+One pooled ``requests.Session`` per process keeps TLS connections alive
+between calls from every Streamlit session. Each request has connect/read
+timeouts, is retried with exponential backoff (honouring ``Retry-After``)
+on 429, 5xx and connection errors, and waits for a slot in a process-wide
+concurrency limit. ``post_json_many`` runs a batch of requests concurrently
+from asyncio on a small thread pool.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("YOUASSIST_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("YOUASSIST_HTTP_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("YOUASSIST_HTTP_RETRIES", "3"))
+HTTP_CONCURRENCY = int(os.getenv("YOUASSIST_HTTP_CONCURRENCY", "8"))
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 20.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HttpError(RuntimeError):
+    """Non-retryable HTTP failure, or a retryable one that ran out of attempts"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class HttpClient:
+    """Pooled, rate-limited JSON client with timeouts and retries"""
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), retries=HTTP_RETRIES,
+                 concurrency=HTTP_CONCURRENCY, backoff=BACKOFF_SECONDS):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="http")
+
+    def _delay(self, attempt, response=None):
+        """Backoff before the next attempt, preferring the server's Retry-After"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), MAX_BACKOFF_SECONDS)
+                except ValueError:
+                    pass
+        delay = min(self.backoff * 2 ** attempt, MAX_BACKOFF_SECONDS)
+        return delay * (0.5 + random.random() / 2)
+
+    def post_json(self, url, payload, headers=None):
+        """POST a JSON payload and return the decoded JSON response"""
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            response = None
+            try:
+                with self._slots:
+                    response = self.session.post(url, json=payload, headers=headers,
+                                                 timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last:
+                    raise HttpError(f"Request to {url} failed: {e}") from e
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRY_STATUSES or last:
+                    raise HttpError(f"HTTP {response.status_code} from {url}", response.status_code)
+            time.sleep(self._delay(attempt, response))
+
+    async def post_json_async(self, url, payload, headers=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.post_json, url, payload, headers)
+
+    def post_json_many(self, url, payloads, headers=None):
+        """POST several payloads concurrently; results (or exceptions) in input order"""
+        async def gather():
+            return await asyncio.gather(
+                *(self.post_json_async(url, payload, headers) for payload in payloads),
+                return_exceptions=True,
+            )
+        return asyncio.run(gather())
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide HttpClient shared by every session"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,147 @@
+"""Decode-once image ingest.
+
+An uploaded cover image is decoded a single time, rotated according to its
+EXIF orientation, and immediately scaled to everything the app needs: a
+letterboxed RGB canvas per output resolution and small JPEG thumbnails for
+the UI. The results are kept in a process-wide LRU keyed by the SHA-256 of
+the image bytes and bounded by total bytes, so repeated renders, effect
+previews and reruns never decode or resize the same image again.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageOps
+
+IMAGE_CACHE_BYTES = int(os.getenv("YOUASSIST_IMAGE_CACHE_MB", "256")) * 1024 * 1024
+THUMBNAIL_QUALITY = 85
+
+
+def decode_image(image_bytes, max_size=None):
+    """Decode to an upright RGB image; JPEGs are decoded at reduced scale when max_size allows"""
+    img = Image.open(io.BytesIO(image_bytes))
+    if max_size:
+        # The EXIF rotation may swap width and height, so ask for a square
+        side = max(max_size)
+        img.draft("RGB", (side, side))
+    img = ImageOps.exif_transpose(img)
+    return img.convert("RGB")
+
+
+def letterbox(img, size):
+    """Scale the image up or down to fit inside size and centre it on a black canvas"""
+    width, height = size
+    fitted = ImageOps.contain(img, (width, height), Image.LANCZOS)
+    canvas = Image.new("RGB", (width, height))
+    canvas.paste(fitted, ((width - fitted.width) // 2, (height - fitted.height) // 2))
+    canvas = np.asarray(canvas, dtype=np.uint8)
+    # Shared between renders, so nobody may draw on it in place
+    canvas.flags.writeable = False
+    return canvas
+
+
+def thumbnail_jpeg(img, max_side):
+    fitted = img.copy()
+    fitted.thumbnail((max_side, max_side), Image.LANCZOS)
+    buf = io.BytesIO()
+    fitted.save(buf, format="JPEG", quality=THUMBNAIL_QUALITY)
+    return buf.getvalue()
+
+
+def _entry_bytes(entry):
+    return (sum(canvas.nbytes for canvas in entry["canvases"].values())
+            + sum(len(data) for data in entry["thumbnails"].values()))
+
+
+class ImageCache:
+    """LRU of pre-scaled canvases and thumbnails per image, bounded by bytes"""
+
+    def __init__(self, max_bytes=IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def ingest(self, image_bytes, sizes=(), thumbnails=()):
+        """Canvases for each (width, height) in sizes and JPEG thumbnails for each max side
+
+        Returns {"canvases": {size: array}, "thumbnails": {side: bytes}}; anything
+        not cached yet is produced from a single decode of the image.
+        """
+        sizes = [tuple(size) for size in sizes]
+        key = hashlib.sha256(image_bytes).hexdigest()
+        with self._lock:
+            entry = self._entries.get(key) or {"canvases": {}, "thumbnails": {}}
+            missing_sizes = [size for size in sizes if size not in entry["canvases"]]
+            missing_thumbnails = [side for side in thumbnails if side not in entry["thumbnails"]]
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            if missing_sizes or missing_thumbnails:
+                self.misses += 1
+            else:
+                self.hits += 1
+                return self._select(entry, sizes, thumbnails)
+
+        largest = max([max(size) for size in missing_sizes] + list(missing_thumbnails))
+        img = decode_image(image_bytes, (largest, largest))
+        canvases = {size: letterbox(img, size) for size in missing_sizes}
+        thumbs = {side: thumbnail_jpeg(img, side) for side in missing_thumbnails}
+
+        with self._lock:
+            if key in self._entries:
+                # Another thread may have ingested the same image meanwhile
+                entry = self._entries[key]
+                self._bytes -= _entry_bytes(entry)
+            entry["canvases"].update(canvases)
+            entry["thumbnails"].update(thumbs)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._bytes += _entry_bytes(entry)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _entry_bytes(evicted)
+            return self._select(entry, sizes, thumbnails)
+
+    def entry_bytes(self, key):
+        """Bytes held for the image with this SHA-256; 0 if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return _entry_bytes(entry) if entry else 0
+
+    def discard(self, key):
+        """Drop an image's canvases and thumbnails; the next ingest rebuilds them"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._bytes -= _entry_bytes(entry)
+            return _entry_bytes(entry) if entry else 0
+
+    @staticmethod
+    def _select(entry, sizes, thumbnails):
+        return {
+            "canvases": {size: entry["canvases"][size] for size in sizes},
+            "thumbnails": {side: entry["thumbnails"][side] for side in thumbnails},
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries),
+                    "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    """Process-wide ImageCache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache()
+        return _cache
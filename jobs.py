@@ -0,0 +1,206 @@
+"""Persistent background jobs.
+
+Streamlit re-executes the whole script on every widget interaction, so
+heavy work (renders, SEO requests, uploads) must not run inline. A
+JobQueue runs registered handlers on background threads and records every
+job in SQLite: sessions keep only the job id in ``st.session_state`` and
+poll its status, which costs a single indexed query per rerun.
+
+Submitting with an idempotency key that matches a queued, running (or,
+optionally, finished) job returns the existing job id instead of starting
+the work again. Job parameters live only in memory, so jobs left unfinished
+by a server process that has since died are marked as failed on startup.
+A restarted server often gets its old PID back (PID 1 in a container), so
+unfinished jobs carrying the current PID are treated the same way: no
+queue in this process has run them yet.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOBS_DB = os.getenv(
+    "YOUASSIST_JOBS_DB", os.path.join(tempfile.gettempdir(), "youassist_cache", "jobs.sqlite3")
+)
+# Finished jobs older than this are deleted on startup
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+ACTIVE_STATES = ("queued", "running")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    idem_key TEXT,
+    state TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    owner_pid INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_idem ON jobs (kind, idem_key);
+"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class JobContext:
+    """Handed to job handlers to report progress and notice cancellation"""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+
+    def report(self, progress, message=None):
+        """Record progress (0..1) and an optional status line
+
+        Raises JobCancelled if cancellation was requested.
+        """
+        self.check()
+        self.queue._update(self.job_id, progress=float(progress), message=message)
+
+    def check(self):
+        if self.queue._cancel_requested(self.job_id):
+            raise JobCancelled()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """SQLite-backed job registry with a thread pool per job kind"""
+
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._handlers = {}
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._recover()
+
+    def register(self, kind, handler, workers=1):
+        """Run jobs of this kind with handler(job_context, params) -> JSON-able result"""
+        self._handlers[kind] = handler
+        self._pools[kind] = ThreadPoolExecutor(workers, thread_name_prefix=f"{kind}-job")
+
+    def submit(self, kind, params, key=None, reuse_done=False):
+        """Start a job, or return the id of an equivalent one already in flight"""
+        now = time.time()
+        reusable = ACTIVE_STATES + (("done",) if reuse_done else ())
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if key is not None:
+                    row = self._db.execute(
+                        f"SELECT id FROM jobs WHERE kind = ? AND idem_key = ? "
+                        f"AND state IN ({','.join('?' * len(reusable))}) "
+                        f"ORDER BY created DESC LIMIT 1",
+                        (kind, key) + reusable,
+                    ).fetchone()
+                    if row:
+                        self._db.execute("COMMIT")
+                        return row["id"]
+                job_id = uuid.uuid4().hex
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, idem_key, state, owner_pid, created, updated) "
+                    "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, kind, key, os.getpid(), now, now),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self._pools[kind].submit(self._run, kind, job_id, params)
+        return job_id
+
+    def status(self, job_id):
+        """Job record as a dict (state, progress, result, error, ...) or None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def cancel(self, job_id):
+        """Request cancellation; queued jobs are cancelled immediately"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated = ? WHERE id = ?",
+                (time.time(), job_id),
+            )
+            self._db.execute(
+                "UPDATE jobs SET state = 'cancelled' WHERE id = ? AND state = 'queued'", (job_id,)
+            )
+
+    def counts(self):
+        """Number of jobs per (kind, state)"""
+        with self._lock:
+            rows = self._db.execute("SELECT kind, state, COUNT(*) AS n FROM jobs GROUP BY kind, state")
+            return {(row["kind"], row["state"]): row["n"] for row in rows}
+
+    def _update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?",
+                             tuple(fields.values()) + (job_id,))
+
+    def _cancel_requested(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def _run(self, kind, job_id, params):
+        job = JobContext(self, job_id)
+        try:
+            job.check()
+            self._update(job_id, state="running")
+            result = self._handlers[kind](job, params)
+        except JobCancelled:
+            self._update(job_id, state="cancelled")
+        except Exception as e:
+            self._update(job_id, state="failed", error=str(e))
+        else:
+            self._update(job_id, state="done", progress=1.0, result=json.dumps(result))
+
+    def _recover(self):
+        """Fail jobs orphaned by dead (or earlier incarnations of this) process and drop old history"""
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, owner_pid FROM jobs WHERE state IN ('queued', 'running')"
+            ).fetchall()
+            for row in rows:
+                if row["owner_pid"] == os.getpid() or not _pid_alive(row["owner_pid"]):
+                    self._db.execute(
+                        "UPDATE jobs SET state = 'failed', error = 'Interrupted by a server restart', "
+                        "updated = ? WHERE id = ?",
+                        (now, row["id"]),
+                    )
+            self._db.execute(
+                "DELETE FROM jobs WHERE state NOT IN ('queued', 'running') AND updated < ?",
+                (now - JOB_RETENTION_SECONDS,),
+            )
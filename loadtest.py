@@ -0,0 +1,392 @@
+"""Multi-session load test.
+
+Simulates concurrent users walking the four wizard steps of ``youassist.py``
+(upload media, create video, SEO, upload to YouTube) to find how many
+sessions one host can serve before it has to scale out. Streamlit's
+AppTest cannot drive ``st.file_uploader``, so sessions are driven headless:
+each one is a thread making the same calls a Streamlit session makes, on
+the same process-wide services (one media store, one render farm, one job
+queue, one session governor). Jobs are built by the same ``pipeline``
+helpers the app uses, and step 2 renders the effect previews, probes the
+track length and asks for the same outputs as the page does. Every
+simulated rerun and job poll reports the session to the governor.
+
+OpenAI and YouTube are replaced by ``MockServices`` from
+``tests/mock_services.py``, a local HTTP server speaking just enough of the
+chat completions and resumable upload protocols, with configurable
+response latency. Every cache, the media store and the job database live
+in a scratch directory, so runs neither read nor pollute the real ones, and
+every session renders a distinct video (its text overlay differs) unless
+--reuse is given.
+
+For each concurrency level it reports:
+
+- throughput: finished sessions per minute
+- p50/p95/p99/max seconds of every step and of the whole session
+- cpu_seconds / cores_busy: CPU used by the app, render workers and
+  encoders, and that divided by wall time
+- peak_rss_mb: peak resident memory of the app process plus its children
+
+Usage:
+    python loadtest.py [--sessions 1 2 4 8] [--duration 5] [--size 480p] [--preset draft]
+                       [--outputs video,short,thumbnail] [--openai-latency 0.5]
+                       [--slo 120] [--reuse]
+                       [--output loadtest_results.json]
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.mock_services import MockServices
+
+DEFAULT_SESSIONS = [1, 2, 4, 8]
+DEFAULT_DURATION = 5
+RESULTS_PATH = "loadtest_results.json"
+STEPS = ("upload_media", "create_video", "seo", "upload")
+# How often the memory sampler walks the process tree
+SAMPLE_SECONDS = 0.25
+
+
+def configure(scratch, services, upload_kbps=0):
+    """Point every cache, store and external endpoint at the scratch directory and mocks
+
+    Must run before the app modules are imported: they read these at import.
+    """
+    os.environ.update(services.environment())
+    os.environ.update({
+        "YOUASSIST_MEDIA_DIR": os.path.join(scratch, "media"),
+        "YOUASSIST_RENDER_CACHE_DIR": os.path.join(scratch, "renders"),
+        "YOUASSIST_SEO_CACHE_DIR": os.path.join(scratch, "seo"),
+        "YOUASSIST_UPLOAD_STATE_DIR": os.path.join(scratch, "uploads"),
+        "YOUASSIST_JOBS_DB": os.path.join(scratch, "jobs.sqlite3"),
+        "YOUASSIST_UPLOAD_KBPS": str(upload_kbps),
+    })
+
+
+def fixtures(duration):
+    """PNG cover and WAV track bytes, generated so the test runs offline"""
+    import numpy as np
+    from benchmark import synthetic_audio, synthetic_image
+    from audio_analysis import SAMPLE_RATE
+
+    image = io.BytesIO()
+    synthetic_image(1200, 1200).save(image, format="PNG")
+    samples = np.clip(synthetic_audio(duration) * 32767, -32768, 32767).astype("<i2")
+    audio = io.BytesIO()
+    with wave.open(audio, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+    return image.getvalue(), audio.getvalue()
+
+
+def run_session(farm, queue, label, image_bytes, audio_bytes, settings):
+    """Walk one simulated user through the four steps; returns {"steps", "seconds", "error"}
+
+    steps holds the seconds of every step the session got through.
+    """
+    from audio_analysis import probe_duration
+    from batch import wait_for
+    from effects import EFFECT_RENDERERS
+    from media_store import THUMBNAIL_SIZE, get_media_store
+    from pipeline import render_job, seo_job, upload_job
+    from renderer import ingest_image
+    from seo import cached_seo
+    from session_governor import get_session_governor
+
+    governor = get_session_governor()
+    held = {"media": {}, "files": []}
+    steps = {}
+    started = time.perf_counter()
+    step_started = {}
+
+    def rerun():
+        # What the app does at the top of every rerun and on every job poll
+        governor.touch(label, held["media"], held["files"])
+        governor.enforce()
+
+    def step(name):
+        step_started[name] = time.perf_counter()
+        rerun()
+
+    def done(name):
+        steps[name] = time.perf_counter() - step_started[name]
+        time.sleep(settings["think"])
+
+    try:
+        # 1. Upload media: spool both files to the store and ingest the image
+        step("upload_media")
+        store = get_media_store()
+        image = store.put(image_bytes, "cover.png")
+        audio = store.put(audio_bytes, "track.wav")
+        held["media"] = {"image": image, "audio": audio}
+        ingest_image(store.view(image["id"]), thumbnails=[THUMBNAIL_SIZE])
+        done("upload_media")
+
+        # 2. Create video: the page renders every effect preview and reads the
+        # track length before the render is submitted
+        step("create_video")
+        farm.previews(store.view(image["id"]), list(EFFECT_RENDERERS), settings["intensity"])
+        duration = min(settings["duration"], round(probe_duration(audio["path"]), 2))
+        text_overlay = "" if settings["reuse"] else f"Session {label}"
+        params, key = render_job(store.view(image["id"]), store.view(audio["id"]), settings["effect"],
+                                 settings["intensity"], duration, True, text_overlay,
+                                 size=settings["size"], preset=settings["preset"],
+                                 outputs=settings["outputs"], audio_path=audio["path"])
+        render = wait_for(queue, queue.submit("render", params, key=key), rerun)["result"]
+        video_path = render["video_path"]
+        held["files"] = [video_path] + list((render.get("outputs") or {}).values())
+        done("create_video")
+
+        # 3. SEO through the mock OpenAI endpoint
+        step("seo")
+        title = "Load test" if settings["reuse"] else f"Load test {label}"
+        seo = cached_seo(title, "")
+        if seo:
+            seo = dict(zip(("title", "description", "tags"), seo))
+        else:
+            params, key = seo_job(title, "", "loadtest", lookup=False)
+            seo = wait_for(queue, queue.submit("seo", params, key=key), rerun)["result"]
+        done("seo")
+
+        # 4. Resumable upload to the mock YouTube endpoint
+        step("upload")
+        params, key = upload_job(video_path, seo["title"], seo["description"], seo["tags"],
+                                 "private", "loadtest")
+        wait_for(queue, queue.submit("upload", params, key=key, reuse_done=True), rerun)
+        done("upload")
+    except Exception as e:
+        return {"steps": steps, "seconds": time.perf_counter() - started, "error": str(e)}
+    finally:
+        governor.forget(label)
+    return {"steps": steps, "seconds": time.perf_counter() - started, "error": None}
+
+
+def _children(pid):
+    """Every descendant pid of pid, from /proc"""
+    found = []
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        try:
+            tasks = os.listdir(f"/proc/{parent}/task")
+        except OSError:
+            continue
+        for tid in tasks:
+            try:
+                with open(f"/proc/{parent}/task/{tid}/children") as f:
+                    kids = [int(kid) for kid in f.read().split()]
+            except OSError:
+                continue
+            found += kids
+            pending += kids
+    return found
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return 0
+
+
+class MemorySampler:
+    """Background thread tracking the peak RSS of this process and all its descendants"""
+
+    def __init__(self, interval=SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+
+    def _run(self):
+        pid = os.getpid()
+        while not self._stop.is_set():
+            total = sum(_rss_bytes(p) for p in [pid] + _children(pid))
+            self.peak = max(self.peak, total)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        if not self.peak:
+            # No /proc: fall back to the largest single process seen
+            self.peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * 1024
+        return False
+
+
+def _cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))], 3)
+
+    return {"p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": round(ordered[-1], 3)}
+
+
+def run_level(concurrency, image_bytes, audio_bytes, settings, scratch):
+    """Run concurrency sessions at once on a fresh render farm and job queue"""
+    from pipeline import create_job_queue
+    from render_farm import RenderFarm
+
+    # A fresh farm per level: its workers exit at shutdown, so their CPU time
+    # (and that of the encoders they ran) lands in RUSAGE_CHILDREN
+    farm = RenderFarm()
+    queue = create_job_queue(farm, os.path.join(scratch, f"jobs_{concurrency}.sqlite3"))
+    cpu_before = _cpu_seconds()
+    started = time.perf_counter()
+    try:
+        with MemorySampler() as memory, ThreadPoolExecutor(concurrency,
+                                                           thread_name_prefix="session") as pool:
+            futures = [pool.submit(run_session, farm, queue, f"{concurrency}.{n}", image_bytes,
+                                   audio_bytes, settings)
+                       for n in range(concurrency)]
+            sessions = [future.result() for future in futures]
+        wall = time.perf_counter() - started
+    finally:
+        farm.shutdown()
+    cpu = _cpu_seconds() - cpu_before
+
+    finished = [s for s in sessions if s["error"] is None]
+    return {
+        "concurrency": concurrency,
+        "sessions": len(sessions),
+        "done": len(finished),
+        "failed": len(sessions) - len(finished),
+        "errors": sorted({s["error"] for s in sessions if s["error"]}),
+        "wall_seconds": round(wall, 2),
+        "throughput_per_minute": round(len(finished) / wall * 60, 2),
+        "session_seconds": _percentiles([s["seconds"] for s in finished]),
+        "steps": {name: _percentiles([s["steps"][name] for s in sessions if name in s["steps"]])
+                  for name in STEPS},
+        "cpu_seconds": round(cpu, 2),
+        "cores_busy": round(cpu / wall, 2),
+        "cpu_utilization": round(cpu / wall / (os.cpu_count() or 1), 3),
+        "peak_rss_mb": round(memory.peak / 1024 / 1024, 1),
+    }
+
+
+def run_load_test(levels, settings, openai_latency=0.0, youtube_latency=0.0, upload_kbps=0,
+                  progress=None):
+    """Run each concurrency level in turn against the mock services; returns the level results"""
+    scratch = tempfile.mkdtemp(prefix="youassist_load_")
+    services = MockServices(openai_latency, youtube_latency).start()
+    try:
+        configure(scratch, services, upload_kbps)
+        image_bytes, audio_bytes = fixtures(settings["duration"])
+        results = []
+        for concurrency in levels:
+            results.append(run_level(concurrency, image_bytes, audio_bytes, settings, scratch))
+            if progress:
+                progress(results[-1])
+        return results, dict(services.requests)
+    finally:
+        services.stop()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def capacity(results, slo):
+    """Highest concurrency whose sessions all finished with p95 within slo seconds"""
+    ok = [r["concurrency"] for r in results
+          if not r["failed"] and r["session_seconds"] and r["session_seconds"]["p95"] <= slo]
+    return max(ok) if ok else None
+
+
+def main(argv=None):
+    from effects import EFFECT_RENDERERS
+    from encoders import SHARDABLE_PRESETS
+    from renderer import DEFAULT_OUTPUTS, OUTPUT_SIZES, ladder_sizes
+
+    parser = argparse.ArgumentParser(description="Load test the wizard with concurrent simulated sessions.")
+    parser.add_argument("--sessions", nargs="+", type=int, default=DEFAULT_SESSIONS,
+                        help="Concurrency levels to run, one after another")
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION, help="Clip length in seconds")
+    parser.add_argument("--effect", default="spectrum", choices=list(EFFECT_RENDERERS))
+    parser.add_argument("--intensity", type=int, default=50)
+    parser.add_argument("--size", default="480p", choices=sorted(OUTPUT_SIZES))
+    parser.add_argument("--preset", default="draft", choices=SHARDABLE_PRESETS,
+                        help="Encoder preset")
+    parser.add_argument("--outputs", default=",".join(DEFAULT_OUTPUTS),
+                        help="Comma-separated outputs every render makes: video, short, thumbnail")
+    parser.add_argument("--think", type=float, default=0.0, help="Seconds a user pauses after each step")
+    parser.add_argument("--reuse", action="store_true",
+                        help="Give every session identical inputs, exercising the caches")
+    parser.add_argument("--openai-latency", type=float, default=0.5,
+                        help="Seconds the mock OpenAI endpoint takes per request")
+    parser.add_argument("--youtube-latency", type=float, default=0.05,
+                        help="Seconds the mock YouTube endpoint takes to open an upload")
+    parser.add_argument("--upload-kbps", type=int, default=0, help="Upload bandwidth cap (0: none)")
+    parser.add_argument("--slo", type=float, default=120.0,
+                        help="Session p95 seconds a level must stay within to count as served")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+    outputs = tuple(name.strip() for name in args.outputs.split(",") if name.strip())
+    try:
+        ladder_sizes(args.size, outputs)
+    except ValueError as e:
+        parser.error(str(e))
+
+    settings = {"effect": args.effect, "intensity": args.intensity, "duration": args.duration,
+                "size": args.size, "preset": args.preset, "outputs": list(outputs),
+                "think": args.think, "reuse": args.reuse}
+
+    def show(level):
+        session = level["session_seconds"] or {}
+        steps = "  ".join(f"{name} {(level['steps'][name] or {}).get('p95', '-')}" for name in STEPS)
+        print(f"{level['concurrency']:4d} sessions: {level['done']}/{level['sessions']} done in "
+              f"{level['wall_seconds']:.1f}s, {level['throughput_per_minute']:.1f}/min, "
+              f"session p95 {session.get('p95', '-')}s, cpu {level['cores_busy']:.1f} cores, "
+              f"rss {level['peak_rss_mb']:.0f} MB\n      step p95 (s): {steps}", flush=True)
+        for error in level["errors"]:
+            print(f"      error: {error}", flush=True)
+
+    results, requests = run_load_test(args.sessions, settings, args.openai_latency,
+                                      args.youtube_latency, args.upload_kbps, progress=show)
+    served = capacity(results, args.slo)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor(), "cpus": os.cpu_count()},
+        "settings": settings,
+        "slo_seconds": args.slo,
+        "capacity": served,
+        "mock_requests": requests,
+        "levels": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if served:
+        print(f"Up to {served} concurrent sessions stay within the {args.slo:g}s p95 target")
+    else:
+        print(f"No level stayed within the {args.slo:g}s p95 target")
+    print(f"Results written to {args.output}")
+    return 0 if all(not level["failed"] for level in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Content-addressed store for uploaded media.
+
+Uploads are spooled to disk once, named by the SHA-256 of their bytes, and
+sessions keep only a small handle (id, path, name, size) in
+``st.session_state`` instead of the bytes themselves. Consumers get a
+read-only memory-mapped view or a file handle, so a 20 MB WAV is never
+copied into every session, and the browser is sent small downscaled JPEG
+thumbnails instead of the original image inlined as base64.
+
+Like the render cache, the directory is trimmed least-recently-used first
+to a byte budget, with file modification times as the LRU clock. Files
+pinned by a live session (see ``session_governor.py``) are never trimmed.
+"""
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+import threading
+
+from image_ingest import get_image_cache
+
+MEDIA_DIR = os.getenv(
+    "YOUASSIST_MEDIA_DIR", os.path.join(tempfile.gettempdir(), "youassist_cache", "media")
+)
+MEDIA_BYTES = int(os.getenv("YOUASSIST_MEDIA_MB", "2048")) * 1024 * 1024
+COPY_CHUNK_BYTES = 1024 * 1024
+THUMBNAIL_SIZE = 300
+
+
+class MediaStore:
+    """Directory of uploaded files addressed by content hash"""
+
+    def __init__(self, directory=MEDIA_DIR, max_bytes=MEDIA_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # media id -> owners (session ids) that keep the file from eviction
+        self._pins = {}
+        self._pins_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, media_id):
+        return os.path.join(self.directory, media_id)
+
+    def put(self, source, name=""):
+        """Spool a file object (or bytes) to the store and return its handle
+
+        The handle is a small dict {"id", "path", "name", "size"}; storing the
+        same content twice returns the existing file.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        source.seek(0)
+        digest = hashlib.sha256()
+        size = 0
+        partial = os.path.join(self.directory, f".{os.getpid()}.{threading.get_ident()}.part")
+        with open(partial, "wb") as f:
+            while True:
+                chunk = source.read(COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        media_id = digest.hexdigest()
+        path = self._path(media_id)
+        if os.path.exists(path):
+            os.remove(partial)
+            os.utime(path)
+        else:
+            os.replace(partial, path)
+            self.evict()
+        return {"id": media_id, "path": path, "name": name, "size": size}
+
+    def exists(self, media_id):
+        return os.path.exists(self._path(media_id))
+
+    def open(self, media_id):
+        """Binary file handle on the stored file"""
+        path = self._path(media_id)
+        f = open(path, "rb")
+        # Touch the entry so it counts as recently used
+        os.utime(path)
+        return f
+
+    def view(self, media_id):
+        """Read-only memoryview of the stored bytes, backed by a shared mmap"""
+        with self.open(media_id) as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            # The mapping outlives the file descriptor and is shared through
+            # the page cache by every session reading the same upload
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def thumbnail(self, media_id, max_side=THUMBNAIL_SIZE):
+        """JPEG bytes of the image downscaled to fit max_side, from the image ingest cache"""
+        return get_image_cache().ingest(self.view(media_id), thumbnails=[max_side])["thumbnails"][max_side]
+
+    def pin(self, media_id, owner):
+        """Keep media_id out of eviction until owner unpins it"""
+        with self._pins_lock:
+            self._pins.setdefault(media_id, set()).add(owner)
+
+    def unpin(self, owner, keep=()):
+        """Release every pin held by owner except those on media ids in keep"""
+        with self._pins_lock:
+            for media_id in list(self._pins):
+                if media_id not in keep:
+                    self._pins[media_id].discard(owner)
+                    if not self._pins[media_id]:
+                        del self._pins[media_id]
+
+    def evict(self):
+        """Delete least recently used unpinned files until the store fits in max_bytes"""
+        with self._pins_lock:
+            pinned = set(self._pins)
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if os.path.basename(path) in pinned:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_media_store():
+    """Process-wide MediaStore"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MediaStore()
+        return _store
@@ -0,0 +1,10 @@
+"""Helpers shared by the modules that shell out to ffmpeg."""
+import shutil
+
+
+def find_ffmpeg():
+    """Locate the ffmpeg binary used for decoding and encoding"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg was not found on PATH. Install it to render videos.")
+    return ffmpeg
@@ -0,0 +1,143 @@
+"""Pipeline stages run as background jobs: render, SEO and YouTube upload.
+
+Each stage is a JobQueue handler taking (job, params) and returning a
+JSON-serializable result. None of them touch Streamlit, so the same stages
+can be driven from the web app or from a headless script.
+
+``render_job``, ``seo_job`` and ``upload_job`` build the parameters and
+idempotency key of each job, so the web app, batch mode and the load test
+submit exactly the same work.
+"""
+import hashlib
+import json
+import os
+import time
+from functools import partial
+
+import tracing
+from encoders import DEFAULT_PRESET
+from jobs import JobCancelled, JobQueue
+from render_cache import render_key
+from renderer import DEFAULT_FPS, DEFAULT_OUTPUTS, DEFAULT_SIZE, build_timeline
+from seo import request_seo, sample_seo
+from youtube_upload import upload_video
+
+# Concurrent jobs per stage; renders are additionally capped by the render farm
+SEO_WORKERS = 4
+UPLOAD_WORKERS = int(os.getenv("YOUASSIST_UPLOAD_WORKERS", "2"))
+POLL_SECONDS = 0.25
+
+
+def job_key(*parts):
+    """Idempotency key for a background job"""
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+def render_job(image_bytes, audio_bytes, effect_id, intensity, duration, sync_to_audio=True,
+               text_overlay="", timeline=None, size=DEFAULT_SIZE, fps=DEFAULT_FPS,
+               preset=DEFAULT_PRESET, outputs=DEFAULT_OUTPUTS, audio_path=None):
+    """(params, key) of the render job for these inputs and settings
+
+    audio_path, if known, is a file holding audio_bytes; the render reads
+    the track from it instead of writing out a copy. It is not part of the
+    key.
+    """
+    if timeline is None:
+        timeline = build_timeline(effect_id, intensity, duration)
+    outputs = list(outputs)
+    params = {
+        "image_bytes": image_bytes,
+        "audio_bytes": audio_bytes,
+        "effect_id": effect_id,
+        "intensity": intensity,
+        "duration": duration,
+        "sync_to_audio": sync_to_audio,
+        "text_overlay": text_overlay,
+        "timeline": timeline,
+        "size": size,
+        "fps": fps,
+        "preset": preset,
+        "outputs": outputs,
+        "audio_path": audio_path,
+    }
+    key = render_key(image_bytes, audio_bytes, effect_id, intensity, duration, sync_to_audio,
+                     text_overlay, size, fps, timeline, preset, outputs)
+    return params, key
+
+
+def seo_job(title, description, api_key, lookup=True):
+    """(params, key) of the SEO job; lookup=False when the caller has just checked the SEO cache"""
+    params = {"title": title, "description": description, "api_key": api_key, "lookup": lookup}
+    return params, job_key("seo", title, description)
+
+
+def upload_job(video_path, title, description, tags, privacy="private", token=None):
+    """(params, key) of the upload job
+
+    The key holds a digest of the token, so a finished upload is only
+    handed back for the same account, and never a demo upload for a real
+    one.
+    """
+    params = {"video_path": video_path, "title": title, "description": description,
+              "tags": tags, "privacy": privacy, "token": token}
+    account = hashlib.sha256(token.encode()).hexdigest() if token else "demo"
+    key = job_key("upload", video_path, title, description, tags, privacy, account)
+    return params, key
+
+
+def run_render(farm, job, params):
+    """Render through the shared render farm and return the video path and every output's path"""
+    with tracing.span("render.submit"):
+        farm_job = farm.submit(**params)
+    started = time.perf_counter()
+    try:
+        while True:
+            status = farm.status(farm_job)
+            if status["state"] == "done":
+                tracing.record("render.job", time.perf_counter() - started, cached=status["cached"])
+                return {"video_path": status["output"], "outputs": status["outputs"],
+                        "cached": status["cached"]}
+            if status["state"] == "failed":
+                raise RuntimeError(status["error"])
+            if status["state"] == "cancelled":
+                raise JobCancelled()
+            job.report(status["progress"])
+            time.sleep(POLL_SECONDS)
+    except JobCancelled:
+        farm.cancel(farm_job)
+        raise
+    finally:
+        if farm.status(farm_job)["state"] not in ("queued", "running"):
+            farm.forget(farm_job)
+
+
+def run_seo(job, params):
+    """Generate SEO title, description and tags; sample content without an API key"""
+    if not params.get("api_key"):
+        title, description, tags = sample_seo(params["title"], params["description"])
+        return {"title": title, "description": description, "tags": tags}
+    with tracing.span("seo.request"):
+        title, description, tags = request_seo(params["title"], params["description"], params["api_key"],
+                                               lookup=params.get("lookup", True))
+    return {"title": title, "description": description, "tags": tags}
+
+
+def run_upload(job, params):
+    """Upload the rendered video to YouTube, reporting bytes sent and throughput"""
+    def progress(sent, total, rate):
+        job.report(sent / total if total else 1.0, f"{sent / 1e6:.1f} of {total / 1e6:.1f} MB, "
+                                                   f"{rate / 1e6:.1f} MB/s")
+
+    with tracing.span("upload.transfer"):
+        return upload_video(params["video_path"], params["title"], params["description"],
+                            params["tags"], params.get("privacy", "private"), params.get("token"),
+                            progress=progress)
+
+
+def create_job_queue(farm, path=None):
+    """JobQueue with the render, SEO and upload stages registered"""
+    queue = JobQueue(path) if path else JobQueue()
+    queue.register("render", partial(run_render, farm), workers=farm.max_jobs)
+    queue.register("seo", run_seo, workers=SEO_WORKERS)
+    queue.register("upload", run_upload, workers=UPLOAD_WORKERS)
+    return queue
@@ -0,0 +1,171 @@
+"""Content-addressed cache of rendered videos.
+
+A render is identified by the SHA-256 of everything that affects its pixels
+and sound: the image and audio bytes plus every render setting. Finished
+MP4s (and JPEG thumbnails) are stored on disk under that key, so clicking "Create Video" again
+with the same inputs returns the existing file instead of re-rendering.
+The directory is trimmed least-recently-used first once it grows past a
+byte budget; file modification times double as the LRU clock so several
+server processes can share one cache directory. Files a session is still
+showing can be pinned, which keeps them from being evicted by this process.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+RENDER_CACHE_DIR = os.getenv(
+    "YOUASSIST_RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "youassist_cache", "renders")
+)
+RENDER_CACHE_BYTES = int(os.getenv("YOUASSIST_RENDER_CACHE_MB", "2048")) * 1024 * 1024
+CACHED_SUFFIXES = (".mp4", ".jpg")
+
+# Pinned file -> owners holding it, shared by every RenderCache in the process
+_pins = {}
+_pins_lock = threading.Lock()
+
+
+def pin(path, owner):
+    """Keep a cached file out of eviction until owner unpins it"""
+    with _pins_lock:
+        _pins.setdefault(os.path.realpath(path), set()).add(owner)
+
+
+def unpin(owner, keep=()):
+    """Release every pin held by owner except those on the paths in keep"""
+    keep = {os.path.realpath(path) for path in keep}
+    with _pins_lock:
+        for path in list(_pins):
+            if path not in keep:
+                _pins[path].discard(owner)
+                if not _pins[path]:
+                    del _pins[path]
+
+
+def _digest(blobs, settings):
+    digest = hashlib.sha256()
+    for part in list(blobs) + [repr(s).encode() for s in settings]:
+        # Length prefixes keep different splits of the same bytes apart
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _ladder(outputs, output):
+    # Finished renders (and the render jobs keyed on them) are per set of
+    # outputs; plain single-video renders keep their original keys
+    if tuple(outputs) == ("video",) and output == "video":
+        return []
+    return ["ladder", tuple(outputs), output]
+
+
+def _chunk(output):
+    # Every output is cut from the same 16:9 frames whatever else is
+    # rendered alongside it, so chunks are shared between sets of outputs
+    return [] if output == "video" else ["ladder", output]
+
+
+def render_key(image_bytes, audio_bytes, effect_id, intensity, duration, sync_to_audio,
+               text_overlay="", size="", fps=0, timeline=None, preset="", outputs=("video",),
+               output="video"):
+    """Hash of the inputs and settings that determine one output of a render"""
+    settings = [effect_id, intensity, duration, bool(sync_to_audio), text_overlay or "", size, fps,
+                timeline or [], preset] + _ladder(outputs, output)
+    return _digest([image_bytes or b"", audio_bytes or b""], settings)
+
+
+def segment_key(image_bytes, audio_bytes, segment, duration, sync_to_audio, text_overlay="",
+                size="", fps=0, preset="", output="video"):
+    """Hash identifying the encoded chunk of one timeline segment of one output"""
+    settings = ["segment", sorted(segment.items()), duration, bool(sync_to_audio),
+                text_overlay or "", size, fps, preset] + _chunk(output)
+    return _digest([image_bytes or b"", audio_bytes or b""], settings)
+
+
+class RenderCache:
+    """Disk-backed LRU of encoded MP4s bounded by total bytes"""
+
+    def __init__(self, directory=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix=".mp4"):
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def get(self, key, suffix=".mp4", count=True):
+        """Path of the cached file for key, or None on a miss
+
+        Lookups count towards the hit rate unless count is False, as for the
+        segment chunks a render looks up on its way to the final video.
+        """
+        path = self._path(key, suffix)
+        try:
+            # Touch the entry so it counts as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            if count:
+                with self._lock:
+                    self.misses += 1
+            return None
+        if count:
+            with self._lock:
+                self.hits += 1
+        return path
+
+    def put(self, key, video_path, suffix=".mp4"):
+        """Move a freshly rendered video or thumbnail into the cache and return its new path"""
+        path = self._path(key, suffix)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        shutil.move(video_path, partial)
+        os.replace(partial, path)
+        self.evict()
+        return path
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(CACHED_SUFFIXES):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Delete least recently used unpinned videos until the cache fits in max_bytes"""
+        with _pins_lock:
+            pinned = set(_pins)
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if os.path.realpath(path) in pinned:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        """Hit/miss counters for this process and the current size on disk"""
+        entries = self._entries()
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,359 @@
+"""Multi-process render scheduler.
+
+Render jobs from every Streamlit session go through one process-wide
+RenderFarm. A job's frame range is cut into short shards that worker
+processes encode in parallel, and the shards are then stitched back
+together in order with ffmpeg's concat demuxer (stream copy, no re-encode)
+while the soundtrack is muxed in. At most ``max_jobs`` jobs render at once;
+the rest wait in a queue, so the Streamlit script thread only ever submits
+and polls. Finished videos go into the render cache, and a submit whose
+inputs match a cached render completes without rendering anything.
+
+A clip is made of timeline segments (Intro, Effect, Transition, Outro) that
+are rendered and cached as separate video-only chunks, so editing one
+segment re-renders only that chunk; the final MP4 is assembled from the
+chunks by stream concatenation.
+
+A job can ask for several outputs (16:9 video, 9:16 Short, thumbnail).
+Every shard computes its frames once on the 16:9 video canvas and encodes
+each output's crop side by side, so the effect cost does not grow with the
+number of outputs; each output then has its own chunks and final file.
+
+Two-pass presets are not accepted: each shard's first pass would see only
+its own 2 s of frames (see ``encoders.py``).
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import tracing
+from audio_analysis import analyze_audio
+from encoders import DEFAULT_PRESET, ENCODER_THREADS, SHARDABLE_PRESETS
+from render_cache import RenderCache, render_key, segment_key
+from renderer import (
+    DEFAULT_FPS, DEFAULT_OUTPUTS, DEFAULT_SIZE, PREVIEW_SIZE, best_frame, build_context,
+    build_timeline, concat_segments, encode_ladder, ladder_sizes, load_canvas, render_preview,
+    render_thumbnail, segment_frames, write_audio,
+)
+
+RENDER_WORKERS = int(os.getenv("YOUASSIST_RENDER_WORKERS", os.cpu_count() or 1))
+MAX_RENDER_JOBS = int(os.getenv("YOUASSIST_MAX_RENDER_JOBS", "2"))
+# Longest shard handed to a single worker; short shards keep progress smooth
+# and let several jobs interleave on the pool
+SHARD_SECONDS = 2
+# Effect previews kept in memory, keyed by (image hash, effect, intensity)
+PREVIEW_CACHE_SIZE = 100
+# Processes reserved for effect previews, so a page waiting on them never
+# queues behind the shards of running renders
+PREVIEW_WORKERS = int(os.getenv("YOUASSIST_PREVIEW_WORKERS", "2"))
+
+
+class RenderCancelled(Exception):
+    """Raised inside a render when its job has been cancelled"""
+
+
+def shard_ranges(start, stop, fps, workers):
+    """Split the frame range [start, stop) into contiguous (start, stop) shards"""
+    size = min(int(SHARD_SECONDS * fps), -(-(stop - start) // workers))
+    size = max(1, size)
+    return [(first, min(first + size, stop)) for first in range(start, stop, size)]
+
+
+def render_shard(canvas, effect_id, ctx, start, stop, outputs, preset=DEFAULT_PRESET, threads=0,
+                 thumbnail=None):
+    """Worker entry point: encode one shard of the clip as a video-only segment per output
+
+    outputs maps an output name to its (path, size). Returns the seconds
+    spent on effect math and on everything else (encoding).
+    """
+    timings = {}
+    encode_ladder(canvas, effect_id, ctx, outputs, start, stop, timings=timings,
+                  preset=preset, threads=threads, thumbnail=thumbnail)
+    return {"effects": timings["effects"], "encode": timings["total"] - timings["effects"]}
+
+
+class RenderFarm:
+    """Queue of render jobs executed on a shared pool of worker processes"""
+
+    def __init__(self, workers=RENDER_WORKERS, max_jobs=MAX_RENDER_JOBS, cache=None):
+        self.workers = max(1, workers)
+        self.max_jobs = max(1, max_jobs)
+        self.cache = cache if cache is not None else RenderCache()
+        # Shards already run on every worker, so each encoder gets its share of the cores
+        self.encoder_threads = ENCODER_THREADS or max(1, (os.cpu_count() or 1) // self.workers)
+        # spawn rather than fork: the Streamlit server process is multi-threaded
+        self._pool = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._jobs_pool = ThreadPoolExecutor(self.max_jobs, thread_name_prefix="render-job")
+        # Started on the first preview request
+        self._preview_pool = None
+        self._jobs = {}
+        self._previews = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, image_bytes, audio_bytes, effect_id, intensity=50, duration=15,
+               sync_to_audio=True, size=DEFAULT_SIZE, fps=DEFAULT_FPS, text_overlay="",
+               timeline=None, preset=DEFAULT_PRESET, outputs=DEFAULT_OUTPUTS, audio_path=None):
+        """Queue a render and return its job id; cached renders finish immediately
+
+        timeline is a list of segments from renderer.build_timeline; by default
+        the whole clip uses effect_id and intensity. outputs names the
+        renderer.OUTPUT_FORMATS to produce from the one render. audio_path,
+        if given, is a file holding audio_bytes (such as the media store's
+        copy); the analysis and the final mux read it instead of a
+        temporary copy.
+        """
+        if preset not in SHARDABLE_PRESETS:
+            raise ValueError(f"Encoder preset {preset!r} cannot be used for sharded renders")
+        job_id = uuid.uuid4().hex
+        outputs = tuple(outputs)
+        ladder_sizes(size, outputs)
+        if timeline is None:
+            timeline = build_timeline(effect_id, intensity, duration)
+        # Segments too short to hold a frame would produce empty chunks
+        timeline = [s for s in timeline if segment_frames(s, fps)[0] < segment_frames(s, fps)[1]]
+        keys = {
+            name: render_key(image_bytes, audio_bytes, effect_id, intensity, duration,
+                             sync_to_audio, text_overlay, size, fps, timeline, preset,
+                             outputs, name)
+            for name in outputs
+        }
+        cached = {name: self.cache.get(key, _suffix(name)) for name, key in keys.items()}
+        with self._lock:
+            if all(cached.values()):
+                self._jobs[job_id] = {"state": "done", "progress": 1.0, "output": _primary(cached),
+                                      "outputs": cached, "error": None, "cached": True}
+                return job_id
+            self._jobs[job_id] = {"state": "queued", "progress": 0.0, "output": None,
+                                  "outputs": None, "error": None, "cached": False}
+        self._jobs_pool.submit(
+            self._run, job_id, keys, image_bytes, audio_bytes, timeline,
+            duration, sync_to_audio, size, fps, text_overlay, preset, outputs, audio_path,
+        )
+        return job_id
+
+    def status(self, job_id):
+        """Snapshot of a job: state (queued/running/done/failed/cancelled), progress, output, outputs, error, cached
+
+        output is the main video and outputs maps every requested output to its file.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def previews(self, image_bytes, effect_ids, intensity=50):
+        """Looping GIF previews per effect, rendering any missing ones in parallel
+
+        They run on their own small process pool, not behind queued render shards.
+        """
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        results = {}
+        with self._lock:
+            for effect_id in effect_ids:
+                key = (image_hash, effect_id, intensity)
+                if key in self._previews:
+                    self._previews.move_to_end(key)
+                    results[effect_id] = self._previews[key]
+        missing = [effect_id for effect_id in effect_ids if effect_id not in results]
+        if not missing:
+            return results
+
+        with tracing.span("preview.canvas"):
+            canvas = load_canvas(image_bytes, PREVIEW_SIZE)
+        with self._lock:
+            if self._preview_pool is None:
+                self._preview_pool = ProcessPoolExecutor(
+                    max(1, PREVIEW_WORKERS), mp_context=multiprocessing.get_context("spawn")
+                )
+            pool = self._preview_pool
+        futures = {
+            effect_id: pool.submit(render_preview, canvas, effect_id, intensity)
+            for effect_id in missing
+        }
+        with tracing.span("preview.render", effects=len(missing)):
+            for effect_id, future in futures.items():
+                results[effect_id] = future.result()
+        with self._lock:
+            for effect_id in missing:
+                self._previews[(image_hash, effect_id, intensity)] = results[effect_id]
+            while len(self._previews) > PREVIEW_CACHE_SIZE:
+                self._previews.popitem(last=False)
+        return results
+
+    def cancel(self, job_id):
+        """Stop a queued or running render at the next shard boundary"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["state"] in ("queued", "running"):
+                job["cancel"] = True
+
+    def _cancelled(self, job_id):
+        with self._lock:
+            return self._jobs[job_id].get("cancel", False)
+
+    def forget(self, job_id):
+        """Drop a finished job's bookkeeping"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self):
+        self._jobs_pool.shutdown(wait=False, cancel_futures=True)
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self._preview_pool is not None:
+            self._preview_pool.shutdown(wait=True, cancel_futures=True)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, keys, image_bytes, audio_bytes, timeline, duration,
+             sync_to_audio, size, fps, text_overlay, preset, outputs, audio_path=None):
+        if self._cancelled(job_id):
+            self._update(job_id, state="cancelled")
+            return
+        self._update(job_id, state="running")
+        try:
+            rendered = self._render(job_id, image_bytes, audio_bytes, timeline, duration,
+                                    sync_to_audio, size, fps, text_overlay, preset, outputs,
+                                    audio_path)
+            workdir = os.path.dirname(_primary(rendered))
+            rendered = {name: self.cache.put(keys[name], path, _suffix(name))
+                        for name, path in rendered.items()}
+            shutil.rmtree(workdir, ignore_errors=True)
+        except RenderCancelled:
+            self._update(job_id, state="cancelled")
+        except Exception as e:
+            self._update(job_id, state="failed", error=str(e))
+        else:
+            self._update(job_id, state="done", progress=1.0, output=_primary(rendered),
+                         outputs=rendered)
+
+    def _render(self, job_id, image_bytes, audio_bytes, timeline, duration, sync_to_audio,
+                size, fps, text_overlay, preset, outputs, audio_path=None):
+        if audio_path and not os.path.exists(audio_path):
+            audio_path = None
+        with tracing.span("render.audio_analysis"):
+            analysis = analyze_audio(audio_bytes, fps, audio_path) if audio_bytes else None
+        crops, master = ladder_sizes(size, outputs)
+        videos = [name for name in outputs if name != "thumbnail"]
+        with tracing.span("render.canvas", size=size, outputs=len(outputs)):
+            canvas = load_canvas(image_bytes, master)
+        workdir = tempfile.mkdtemp(prefix="youassist_")
+        shard_dir = tempfile.mkdtemp(dir=workdir)
+
+        # Each timeline segment is its own cached chunk per output; a segment
+        # renders (once, for all outputs) if any of its chunks is missing
+        chunks = {name: [] for name in videos}
+        pending = []
+        for i, segment in enumerate(timeline):
+            keys = {
+                name: segment_key(image_bytes, audio_bytes, segment, duration, sync_to_audio,
+                                  text_overlay, size, fps, preset, name)
+                for name in videos
+            }
+            for name in videos:
+                chunks[name].append(self.cache.get(keys[name], count=False))
+            if any(chunks[name][i] is None for name in videos):
+                pending.append((i, keys))
+
+        contexts = {}
+        thumbnail = None
+        if "thumbnail" in crops:
+            ctx = build_context(timeline[0]["effect"], timeline[0]["intensity"], duration, fps,
+                                sync_to_audio, analysis=analysis)
+            frame = best_frame(ctx, segment_frames(timeline[0], fps)[0],
+                               segment_frames(timeline[-1], fps)[1])
+            thumbnail = (frame, os.path.join(workdir, "thumbnail.jpg"), crops["thumbnail"])
+
+        try:
+            jobs = []
+            for i, keys in pending:
+                segment = timeline[i]
+                ctx = contexts[i] = build_context(segment["effect"], segment["intensity"], duration,
+                                                  fps, sync_to_audio, analysis=analysis,
+                                                  text_overlay=text_overlay)
+                start, stop = segment_frames(segment, fps)
+                shards = shard_ranges(start, stop, fps, self.workers)
+                paths = [
+                    {name: os.path.join(shard_dir, f"{i:02d}_{n:05d}_{name}.mp4") for name in videos}
+                    for n in range(len(shards))
+                ]
+                futures = []
+                for (a, b), shard_paths in zip(shards, paths):
+                    # The shard holding the thumbnail frame saves it on the way past
+                    still = thumbnail if thumbnail and a <= thumbnail[0] < b else None
+                    shard_outputs = {name: (path, crops[name]) for name, path in shard_paths.items()}
+                    futures.append(self._pool.submit(render_shard, canvas, segment["effect"], ctx,
+                                                     a, b, shard_outputs, preset,
+                                                     self.encoder_threads, still))
+                jobs.append((i, keys, paths, futures))
+
+            futures = [future for _, _, _, fs in jobs for future in fs]
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    timings = future.result()
+                    # Measured inside the worker processes
+                    tracing.record("render.effects", timings["effects"])
+                    tracing.record("render.encode", timings["encode"])
+                    if self._cancelled(job_id):
+                        raise RenderCancelled()
+                    # Leave the last few percent for stitching
+                    self._update(job_id, progress=0.95 * done / len(futures))
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+            if thumbnail and not os.path.exists(thumbnail[1]):
+                # Its segment came from the cache: render just that one frame
+                i = next(n for n, s in enumerate(timeline)
+                         if segment_frames(s, fps)[0] <= thumbnail[0] < segment_frames(s, fps)[1])
+                segment = timeline[i]
+                ctx = contexts.get(i) or build_context(segment["effect"], segment["intensity"],
+                                                       duration, fps, sync_to_audio,
+                                                       analysis=analysis, text_overlay=text_overlay)
+                with tracing.span("render.thumbnail"):
+                    render_thumbnail(canvas, segment["effect"], ctx, thumbnail[0], thumbnail[2],
+                                     thumbnail[1])
+
+            rendered = {}
+            with tracing.span("render.concat", chunks=len(timeline) * len(videos)):
+                for i, keys, paths, _ in jobs:
+                    for name in videos:
+                        chunk = os.path.join(workdir, f"chunk_{i:02d}_{name}.mp4")
+                        concat_segments([shard[name] for shard in paths], chunk)
+                        chunks[name][i] = self.cache.put(keys[name], chunk)
+
+                # Without a stored copy the audio is written out for the mux
+                audio_file = audio_path
+                if audio_bytes and not audio_file:
+                    audio_file = write_audio(audio_bytes, workdir)
+                for name in videos:
+                    rendered[name] = os.path.join(workdir, f"{name}.mp4")
+                    concat_segments(chunks[name], rendered[name], audio_file, duration)
+            if audio_file and audio_file != audio_path:
+                os.remove(audio_file)
+            if thumbnail:
+                rendered["thumbnail"] = thumbnail[1]
+            return rendered
+        except Exception:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        finally:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+def _suffix(output):
+    return ".jpg" if output == "thumbnail" else ".mp4"
+
+
+def _primary(paths):
+    """The main video among a render's outputs: the 16:9 video if there is one"""
+    return paths.get("video") or next(path for name, path in paths.items() if name != "thumbnail")
@@ -0,0 +1,383 @@
+"""Video render engine.
+
+Turns the uploaded image and audio into an MP4: the image is decoded once
+into a cached canvas (see ``image_ingest.py``), every frame is computed by
+the NumPy effects in ``effects.py`` a batch at a time and the raw RGB
+frames are handed straight to an encoder (see ``encoders.py``), which
+encodes them and muxes in the soundtrack.
+
+The render path is a chain of generators (effect batches -> pixel format ->
+output crops -> encoders), so only one bounded batch of frames is ever
+alive no matter how long the clip is.
+
+One render can feed several outputs: the effects run once on the 16:9
+video frame, so the video is the same whether or not other outputs are
+asked for. Each output gets its own encoder. The 9:16 Short is a centre
+crop of that frame padded above and below with black, and the thumbnail
+is the video frame where the audio is loudest.
+"""
+import io
+import os
+import subprocess
+import time
+
+import numpy as np
+from PIL import Image
+
+from effects import EFFECT_RENDERERS
+from encoders import AUDIO_ARGS, DEFAULT_PRESET, ENCODER_THREADS, encode_outputs
+from image_ingest import get_image_cache
+from media_tools import find_ffmpeg
+from text_overlay import composite_text
+
+OUTPUT_SIZES = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+DEFAULT_SIZE = "720p"
+# Size of quick draft renders
+DRAFT_SIZE = "480p"
+DEFAULT_FPS = 30
+# Timeline segments and the share of the clip each one covers
+TIMELINE_SEGMENTS = [("Intro", 0.15), ("Effect", 0.55), ("Transition", 0.15), ("Outro", 0.15)]
+# Effect card previews: a short, small, low frame rate loop
+PREVIEW_SIZE = (256, 144)
+PREVIEW_FPS = 10
+PREVIEW_SECONDS = 2
+PREVIEW_COLORS = 96
+# Canvases prepared for every uploaded image
+INGEST_SIZES = list(OUTPUT_SIZES.values()) + [PREVIEW_SIZE]
+# Upper bound on the raw frames held per batch; the batch length is derived
+# from it so peak memory is the same for a 5 second and a 60 second clip
+BATCH_BYTES = 32 * 1024 * 1024
+DEFAULT_BPM = 120.0
+# Outputs a render can produce in one pass over the frames
+OUTPUT_FORMATS = ("video", "short", "thumbnail")
+DEFAULT_OUTPUTS = ("video",)
+THUMBNAIL_QUALITY = 90
+# Share of the clip at either end never used for the thumbnail (fades, intros)
+THUMBNAIL_MARGIN = 0.1
+
+
+def ingest_image(image_bytes, thumbnails=()):
+    """Decode the image once and cache its canvas at every output and preview size
+
+    thumbnails lists the max sides of JPEG thumbnails to prepare in the same pass.
+    """
+    return get_image_cache().ingest(image_bytes, INGEST_SIZES, thumbnails)
+
+
+def load_canvas(image_bytes, size):
+    """Letterboxed canvas of the output size, from the image ingest cache"""
+    size = tuple(size)
+    sizes = INGEST_SIZES if size in INGEST_SIZES else [size]
+    return get_image_cache().ingest(image_bytes, sizes)["canvases"][size]
+
+
+def beat_envelope(frame_count, fps, bpm=DEFAULT_BPM):
+    """Per-frame pulse that spikes on every beat and decays until the next"""
+    beats = np.arange(frame_count, dtype=np.float32) / fps * bpm / 60.0
+    return np.exp(-6.0 * (beats % 1.0)).astype(np.float32)
+
+
+def build_timeline(effect_id, intensity, duration, overrides=None):
+    """Split the clip into timeline segments
+
+    overrides maps a segment name to the settings ("effect", "intensity")
+    that segment uses instead of the clip-wide ones.
+    """
+    timeline = []
+    start = 0.0
+    for n, (name, share) in enumerate(TIMELINE_SEGMENTS):
+        stop = duration if n == len(TIMELINE_SEGMENTS) - 1 else start + share * duration
+        segment = {"name": name, "effect": effect_id, "intensity": intensity,
+                   "start": round(start, 3), "stop": round(stop, 3)}
+        segment.update((overrides or {}).get(name, {}))
+        timeline.append(segment)
+        start = stop
+    return timeline
+
+
+def segment_frames(segment, fps):
+    """Frame range [start, stop) covered by a timeline segment"""
+    return int(round(segment["start"] * fps)), int(round(segment["stop"] * fps))
+
+
+def _fit_frames(values, frame_count):
+    """Trim or zero-pad per-frame analysis data to the clip length"""
+    if len(values) >= frame_count:
+        return values[:frame_count]
+    pad = [(0, frame_count - len(values))] + [(0, 0)] * (values.ndim - 1)
+    return np.pad(values, pad)
+
+
+def build_context(effect_id, intensity, duration, fps=DEFAULT_FPS, sync_to_audio=True,
+                  seed=0, analysis=None, text_overlay="", text_keyframes=None):
+    """Collect everything the effects need to know about the clip"""
+    if effect_id not in EFFECT_RENDERERS:
+        raise ValueError(f"Unknown effect: {effect_id}")
+    frame_count = int(round(duration * fps))
+    spectrum = None
+    if analysis is not None:
+        spectrum = _fit_frames(analysis["spectrum"], frame_count)
+        energy = _fit_frames(analysis["rms"], frame_count)
+    if not sync_to_audio:
+        envelope = np.full(frame_count, 0.5, dtype=np.float32)
+    elif analysis is not None:
+        envelope = _fit_frames(analysis["envelope"], frame_count)
+    else:
+        envelope = beat_envelope(frame_count, fps)
+    if analysis is None:
+        energy = envelope
+    return {
+        "effect": effect_id,
+        "intensity": float(intensity),
+        "duration": float(duration),
+        "fps": fps,
+        "frame_count": frame_count,
+        "envelope": envelope,
+        "spectrum": spectrum,
+        "energy": energy,
+        "seed": seed,
+        "text_overlay": (text_overlay or "").strip(),
+        "text_keyframes": text_keyframes,
+    }
+
+
+def batch_frames(size):
+    """Number of frames per batch that fits in BATCH_BYTES"""
+    width, height = size
+    return max(1, BATCH_BYTES // (width * height * 3))
+
+
+def effect_batches(canvas, effect_id, ctx, start=0, stop=None, batch=None, overlay=True):
+    """Yield (frame indices, frames) for the requested frame range
+
+    overlay=False leaves out the text overlay, for callers that composite
+    it themselves.
+    """
+    effect = EFFECT_RENDERERS[effect_id]
+    if stop is None:
+        stop = ctx["frame_count"]
+    if batch is None:
+        batch = batch_frames((canvas.shape[1], canvas.shape[0]))
+    for first in range(start, stop, batch):
+        idx = np.arange(first, min(first + batch, stop))
+        frames = effect(canvas, idx, ctx)
+        if overlay and ctx.get("text_overlay"):
+            frames = composite_text(frames, idx, ctx)
+        yield idx, frames
+
+
+def timed_batches(batches, timings):
+    """Pass batches through, adding the time spent producing them to timings["effects"]"""
+    batches = iter(batches)
+    while True:
+        started = time.perf_counter()
+        item = next(batches, None)
+        timings["effects"] = timings.get("effects", 0.0) + time.perf_counter() - started
+        if item is None:
+            return
+        yield item
+
+
+def rgb24_batches(batches):
+    """Make sure every batch is packed uint8 RGB, the layout the encoders take as is"""
+    for idx, frames in batches:
+        if frames.dtype != np.uint8:
+            frames = np.clip(frames, 0, 255).astype(np.uint8)
+        yield idx, np.ascontiguousarray(frames)
+
+
+def ladder_sizes(size, outputs=DEFAULT_OUTPUTS):
+    """Frame size of every requested output and of the master frames they are cut from
+
+    The master is always the 16:9 video frame. The Short is that size turned
+    on its side: at 720p it is the middle 720 columns of the 1280x720 frame
+    in a 720x1280 picture, without any resampling. That keeps the effect at
+    one pass for every output, at a price: the square middle fills only
+    56% of the Short, the rest is black above and below, and a cover wider
+    than square loses its sides.
+    """
+    unknown = [name for name in outputs if name not in OUTPUT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown output: {', '.join(unknown)}")
+    if not any(name != "thumbnail" for name in outputs):
+        raise ValueError("At least one video output is required")
+    width, height = OUTPUT_SIZES[size]
+    formats = {"video": (width, height), "short": (height, width), "thumbnail": (width, height)}
+    crops = {name: formats[name] for name in outputs}
+    return crops, (width, height)
+
+
+def crop_frames(frames, size):
+    """Centre crop of a (N, H, W, 3) batch to size, padded with black where it is larger
+
+    A plain crop is a view of frames; padding makes a new array.
+    """
+    width, height = size
+    n, frame_height, frame_width = frames.shape[:3]
+    top = (frame_height - height) // 2
+    left = (frame_width - width) // 2
+    crop = frames[:, max(top, 0):max(top, 0) + height, max(left, 0):max(left, 0) + width]
+    if top >= 0 and left >= 0:
+        return crop
+    out = np.zeros((n, height, width) + frames.shape[3:], dtype=frames.dtype)
+    y, x = max(-top, 0), max(-left, 0)
+    out[:, y:y + crop.shape[1], x:x + crop.shape[2]] = crop
+    return out
+
+
+def best_frame(ctx, start=0, stop=None):
+    """Frame in [start, stop) where the audio energy peaks, away from the clip's ends"""
+    if stop is None:
+        stop = ctx["frame_count"]
+    margin = int(ctx["frame_count"] * THUMBNAIL_MARGIN)
+    first, last = max(start, margin), min(stop, ctx["frame_count"] - margin)
+    if first >= last:
+        first, last = start, stop
+    return first + int(np.argmax(ctx["energy"][first:last]))
+
+
+def save_thumbnail(frame, path):
+    Image.fromarray(frame).save(path, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    return path
+
+
+def ladder_batches(batches, crops, ctx, thumbnail=None):
+    """Cut every master batch into the output crops; yields (frame indices, {output: frames})
+
+    thumbnail is (frame index, path, size): when that frame goes past, its
+    crop is saved as a JPEG.
+    """
+    overlay = bool(ctx.get("text_overlay"))
+    for idx, frames in batches:
+        if thumbnail and idx[0] <= thumbnail[0] <= idx[-1]:
+            at = thumbnail[0] - int(idx[0])
+            still = crop_frames(frames[at:at + 1], thumbnail[2]).copy()
+            if overlay:
+                still = composite_text(still, idx[at:at + 1], ctx)
+            save_thumbnail(still[0], thumbnail[1])
+
+        outputs = {}
+        full = (frames.shape[2], frames.shape[1])
+        # The output showing the whole master frame goes last and takes the
+        # batch itself; the others get their own pixels before it is drawn on
+        for name, size in sorted(crops.items(), key=lambda item: item[1] == full):
+            out = frames if size == full else crop_frames(frames, size)
+            if out is not frames and np.shares_memory(out, frames):
+                out = out.copy()
+            if overlay:
+                out = composite_text(out, idx, ctx)
+            outputs[name] = out
+        yield idx, {name: outputs[name] for name in crops}
+
+
+def encode_ladder(canvas, effect_id, ctx, outputs, start=0, stop=None, audio_path=None,
+                  progress=None, timings=None, preset=DEFAULT_PRESET, threads=ENCODER_THREADS,
+                  thumbnail=None):
+    """Render a frame range once and encode it to every output
+
+    canvas is the master canvas, outputs maps an output name to its
+    (path, size) and thumbnail is an optional (frame index, path, size).
+    If timings is a dict, the seconds spent computing effects and in total
+    are stored in it under "effects" and "total".
+    """
+    started = time.perf_counter()
+    if stop is None:
+        stop = ctx["frame_count"]
+    crops = {name: tuple(size) for name, (_, size) in outputs.items()}
+    duration = ctx["duration"] if audio_path else None
+    if timings is not None:
+        timings["effects"] = 0.0
+
+    def make_batches():
+        batches = effect_batches(canvas, effect_id, ctx, start, stop, overlay=False)
+        if timings is not None:
+            batches = timed_batches(batches, timings)
+        return ladder_batches(rgb24_batches(batches), crops, ctx, thumbnail)
+
+    def on_batch(idx):
+        if progress:
+            progress((int(idx[-1]) + 1 - start) / (stop - start))
+
+    encode_outputs(make_batches, outputs, ctx["fps"], preset, threads, audio_path, duration,
+                   on_batch=on_batch)
+    if timings is not None:
+        timings["total"] = time.perf_counter() - started
+    return outputs
+
+
+def encode_frames(canvas, effect_id, ctx, output_path, start=0, stop=None,
+                  audio_path=None, progress=None, timings=None, preset=DEFAULT_PRESET,
+                  threads=ENCODER_THREADS):
+    """Render a frame range of the clip and encode it to output_path
+
+    If timings is a dict, the seconds spent computing effects and in total
+    are stored in it under "effects" and "total".
+    """
+    dims = (canvas.shape[1], canvas.shape[0])
+    encode_ladder(canvas, effect_id, ctx, {"video": (output_path, dims)}, start, stop,
+                  audio_path, progress, timings, preset, threads)
+    return output_path
+
+
+def render_thumbnail(canvas, effect_id, ctx, frame, size, path):
+    """Render a single frame of the clip and save its crop as the thumbnail"""
+    for idx, frames in effect_batches(canvas, effect_id, ctx, frame, frame + 1, overlay=False):
+        still = crop_frames(frames, size).copy()
+        if ctx.get("text_overlay"):
+            still = composite_text(still, idx, ctx)
+        save_thumbnail(still[0], path)
+    return path
+
+
+def concat_segments(segment_paths, output_path, audio_path=None, duration=None):
+    """Join encoded segments in order without re-encoding and mux in the audio"""
+    ffmpeg = find_ffmpeg()
+    list_path = output_path + ".txt"
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    cmd = [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        cmd += ["-i", audio_path, "-map", "0:v", "-map", "1:a"] + AUDIO_ARGS
+        if duration:
+            cmd += ["-t", str(duration)]
+    cmd += ["-c:v", "copy", "-movflags", "+faststart", output_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {result.stderr.decode(errors='replace').strip()}")
+    return output_path
+
+
+def write_audio(audio_bytes, workdir):
+    """Spool the uploaded audio to a file ffmpeg can read"""
+    audio_path = os.path.join(workdir, "audio")
+    with open(audio_path, "wb") as f:
+        f.write(audio_bytes)
+    return audio_path
+
+
+def render_preview(canvas, effect_id, intensity):
+    """Render a short looping GIF of the effect on a preview-sized canvas"""
+    ctx = build_context(effect_id, intensity, PREVIEW_SECONDS, PREVIEW_FPS)
+    frames = np.concatenate([batch for _, batch in effect_batches(canvas, effect_id, ctx)])
+    # One palette for the whole loop, taken from a strip of sample frames;
+    # per-frame quantization would dominate the preview cost
+    palette = Image.fromarray(np.concatenate(frames[::5], axis=0)).quantize(
+        PREVIEW_COLORS, method=Image.Quantize.FASTOCTREE
+    )
+    images = [
+        Image.fromarray(frame).quantize(palette=palette, dither=Image.Dither.NONE)
+        for frame in frames
+    ]
+    buf = io.BytesIO()
+    images[0].save(buf, format="GIF", save_all=True, append_images=images[1:],
+                   duration=1000 // PREVIEW_FPS, loop=0)
+    return buf.getvalue()
@@ -0,0 +1,155 @@
+"""YouTube SEO content generation with the OpenAI chat API.
+
+Kept free of Streamlit calls so it can run in a background job. Requests go
+through the shared pooled client in ``http_client.py``; point
+OPENAI_BASE_URL at a local mock server to run without the real API.
+Successful results are memoized in ``seo_cache.py``; a response missing
+any of the three parts counts as a failure and is never cached.
+"""
+import os
+
+from http_client import HttpError, get_client
+from seo_cache import get_seo_cache, seo_key
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+OPENAI_URL = f"{OPENAI_BASE_URL}/chat/completions"
+SEO_MODEL = "gpt-3.5-turbo"
+SEO_TEMPERATURE = 0.7
+SEO_MAX_TOKENS = 500
+
+
+def sample_seo(title, description):
+    """Canned SEO content used when the API is unavailable"""
+    return (
+        f"🔥 {title} - Amazing Visual Experience",
+        f"{description}\n\nCheck out this amazing visual experience with stunning effects! Don't forget to like and subscribe for more content like this.",
+        "music video, visual effects, audio visualization, AveePlyer, cool effects, motion graphics"
+    )
+
+
+def build_prompt(title, description):
+    return f"""
+            Create YouTube SEO content based on this video information:
+            
+            Video Title: {title}
+            Video Description: {description}
+            
+            The video has AveePlyer-style visual effects with music.
+            
+            Please provide:
+            1. A catchy, SEO-optimized title (max 70 characters)
+            2. A detailed description with relevant keywords (300-500 chars)
+            3. Ten relevant hashtags/tags (comma-separated)
+            
+            Format your response exactly as:
+            TITLE: [your title]
+            DESCRIPTION: [your description]
+            TAGS: [tag1], [tag2], [tag3], ...
+            """
+
+
+def parse_seo(content):
+    """Split a TITLE:/DESCRIPTION:/TAGS: response into its three parts"""
+    seo_title = ""
+    seo_description = ""
+    seo_tags = ""
+    for line in content.split('\n'):
+        if line.startswith('TITLE:'):
+            seo_title = line[6:].strip()
+        elif line.startswith('DESCRIPTION:'):
+            seo_description = line[12:].strip()
+        elif line.startswith('TAGS:'):
+            seo_tags = line[5:].strip()
+    return seo_title, seo_description, seo_tags
+
+
+def _parsed(content):
+    seo = parse_seo(content)
+    if not all(seo):
+        raise RuntimeError("OpenAI response was not in the expected TITLE/DESCRIPTION/TAGS format")
+    return seo
+
+
+def _request(title, description, api_key):
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+    payload = {
+        "model": SEO_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are a YouTube SEO expert."},
+            {"role": "user", "content": build_prompt(title, description)}
+        ],
+        "temperature": SEO_TEMPERATURE,
+        "max_tokens": SEO_MAX_TOKENS
+    }
+    return headers, payload
+
+
+def _content(result):
+    return result["choices"][0]["message"]["content"]
+
+
+def cache_key(title, description):
+    return seo_key(build_prompt(title, description), SEO_MODEL, SEO_TEMPERATURE)
+
+
+def cached_seo(title, description, cache=None):
+    """Previously generated SEO content for this title and description, or None"""
+    cached = (cache or get_seo_cache()).get(cache_key(title, description))
+    return cached if cached and all(cached) else None
+
+
+def request_seo(title, description, api_key, client=None, cache=None, lookup=True):
+    """Ask the OpenAI API for SEO content; returns (title, description, tags)
+
+    lookup=False skips the cache check, for callers that just made it with
+    ``cached_seo``, so a miss is only counted once.
+    """
+    cache = cache or get_seo_cache()
+    key = cache_key(title, description)
+    cached = cached_seo(title, description, cache) if lookup else None
+    if cached:
+        return cached
+
+    client = client or get_client()
+    headers, payload = _request(title, description, api_key)
+    try:
+        result = client.post_json(OPENAI_URL, payload, headers)
+    except HttpError as e:
+        if e.status_code:
+            raise RuntimeError(f"OpenAI API Error: {e.status_code}") from e
+        raise
+    seo = _parsed(_content(result))
+    cache.put(key, seo)
+    return seo
+
+
+def request_seo_variants(variants, api_key, client=None, cache=None):
+    """Generate SEO content for several (title, description) pairs concurrently
+
+    Returns one (title, description, tags) tuple per variant, or the
+    exception that variant failed with. Cached variants are not re-requested.
+    """
+    cache = cache or get_seo_cache()
+    keys = [cache_key(title, description) for title, description in variants]
+    results = [cached_seo(title, description, cache) for title, description in variants]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+
+    client = client or get_client()
+    prepared = [_request(*variants[i], api_key) for i in missing]
+    responses = client.post_json_many(OPENAI_URL, [payload for _, payload in prepared], prepared[0][0])
+    for i, response in zip(missing, responses):
+        if isinstance(response, Exception):
+            results[i] = response
+            continue
+        try:
+            results[i] = _parsed(_content(response))
+        except RuntimeError as e:
+            results[i] = e
+        else:
+            cache.put(keys[i], results[i])
+    return results
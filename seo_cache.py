@@ -0,0 +1,163 @@
+"""Two-tier cache of generated SEO content.
+
+Entries are keyed by the SHA-256 of the whitespace-normalized prompt, the
+model and the temperature. The first tier is an in-process LRU, so a
+repeated request is answered without touching the disk or the network;
+the second tier is a directory of small JSON files shared by every server
+process and trimmed oldest-first to a byte budget. Entries in both tiers
+expire after a TTL.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+SEO_CACHE_DIR = os.getenv(
+    "YOUASSIST_SEO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "youassist_cache", "seo")
+)
+SEO_CACHE_TTL = float(os.getenv("YOUASSIST_SEO_CACHE_TTL_HOURS", "24")) * 3600
+SEO_CACHE_ENTRIES = 512
+SEO_CACHE_BYTES = int(os.getenv("YOUASSIST_SEO_CACHE_MB", "50")) * 1024 * 1024
+
+
+def seo_key(prompt, model, temperature):
+    """Cache key for a prompt; runs of whitespace do not change the key"""
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(json.dumps([normalized, model, temperature]).encode()).hexdigest()
+
+
+class SeoCache:
+    """In-memory LRU in front of a TTL'd on-disk JSON store"""
+
+    def __init__(self, directory=SEO_CACHE_DIR, ttl=SEO_CACHE_TTL,
+                 max_entries=SEO_CACHE_ENTRIES, max_bytes=SEO_CACHE_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Cached (title, description, tags) for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        return value
+
+    def _read_disk(self, key, now):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry["expires"] <= now:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        value = tuple(entry["value"])
+        self._remember(key, entry["expires"], value)
+        return value
+
+    def _remember(self, key, expires, value):
+        with self._lock:
+            self._memory[key] = (expires, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def put(self, key, value):
+        """Store a (title, description, tags) result in both tiers"""
+        expires = time.time() + self.ttl
+        value = tuple(value)
+        self._remember(key, expires, value)
+        path = self._path(key)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partial, "w") as f:
+            json.dump({"expires": expires, "value": value}, f)
+        os.replace(partial, path)
+        self.evict()
+
+    def evict(self):
+        """Drop expired files, then the oldest ones until the disk tier fits max_bytes"""
+        now = time.time()
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes and mtime + self.ttl > now:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        """Hit/miss counters for this process and the size of both tiers"""
+        disk_entries = 0
+        disk_bytes = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    try:
+                        disk_bytes += entry.stat().st_size
+                    except FileNotFoundError:
+                        continue
+                    disk_entries += 1
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_seo_cache():
+    """Process-wide SeoCache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SeoCache()
+        return _cache
@@ -0,0 +1,215 @@
+"""Process-wide accounting and eviction of per-session media.
+
+Sessions keep only handles in ``st.session_state`` (see ``media_store.py``),
+but what they upload still costs the server: the decoded, pre-scaled
+canvases of the cover image in the image ingest cache and the spectrum and
+beat analysis of the track, both held in this process, plus the files in
+the media store and the rendered videos on disk.
+
+Every rerun reports the session's handles with ``touch``. The governor
+pins those uploads in the media store and the rendered videos in the
+render cache, so neither LRU deletes files a live session is using, and
+``enforce`` keeps memory bounded:
+
+- sessions idle for longer than the TTL are reclaimed: their in-memory
+  media is dropped and their uploads and renders unpinned; if the tab
+  comes back, ``touch`` returns False and the session starts over
+- when the in-memory media of all sessions exceeds the budget, the
+  coldest sessions are offloaded: their canvases and analyses are dropped
+  and are rebuilt from the files on disk if they are needed again
+
+Lookups go through ``sys.modules``, so a process that has not loaded the
+image or audio modules yet is not made to import them.
+"""
+import os
+import sys
+import threading
+import time
+
+SESSION_MEMORY_BYTES = int(os.getenv("YOUASSIST_SESSION_MEMORY_MB", "512")) * 1024 * 1024
+SESSION_IDLE_SECONDS = float(os.getenv("YOUASSIST_SESSION_IDLE_MINUTES", "30")) * 60
+# Least time between two enforcement passes
+ENFORCE_SECONDS = 5.0
+
+
+def _resident_bytes(kind, media_id):
+    """Bytes this process holds in memory for one upload"""
+    if kind == "image":
+        ingest = sys.modules.get("image_ingest")
+        return ingest.get_image_cache().entry_bytes(media_id) if ingest else 0
+    if kind == "audio":
+        analysis = sys.modules.get("audio_analysis")
+        return analysis.cached_bytes(media_id) if analysis else 0
+    return 0
+
+
+def _offload(kind, media_id):
+    """Drop the in-memory copy of one upload; returns the bytes freed"""
+    if kind == "image":
+        ingest = sys.modules.get("image_ingest")
+        return ingest.get_image_cache().discard(media_id) if ingest else 0
+    if kind == "audio":
+        analysis = sys.modules.get("audio_analysis")
+        return analysis.discard(media_id) if analysis else 0
+    return 0
+
+
+def _store():
+    media_store = sys.modules.get("media_store")
+    return media_store.get_media_store() if media_store else None
+
+
+def _unpin(session_id, keep_media=(), keep_files=()):
+    """Release a session's pins on uploads and renders, except those it still holds"""
+    store = _store()
+    if store:
+        store.unpin(session_id, keep=set(keep_media))
+    render_cache = sys.modules.get("render_cache")
+    if render_cache:
+        render_cache.unpin(session_id, keep=keep_files)
+
+
+def _file_bytes(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+class SessionGovernor:
+    """Tracks the media every session holds and keeps their total memory within a budget"""
+
+    def __init__(self, budget_bytes=SESSION_MEMORY_BYTES, idle_seconds=SESSION_IDLE_SECONDS):
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.offloads = 0
+        self.offloaded_bytes = 0
+        self.reclaimed = 0
+        self._sessions = {}
+        # Reclaimed session id -> when; remembered for another TTL so a
+        # returning tab can be told, then forgotten
+        self._expired = {}
+        self._last_enforce = 0.0
+        self._lock = threading.Lock()
+
+    def touch(self, session_id, media=None, files=()):
+        """Record a session's activity and what it holds
+
+        media maps a kind ("image", "audio") to a media store handle (or
+        None) and files lists other files it references, such as rendered
+        videos. Returns False if the session was reclaimed while idle, in
+        which case its handles are stale and it should start over.
+        """
+        media = {kind: handle["id"] for kind, handle in (media or {}).items() if handle}
+        files = [f for f in files if f]
+        with self._lock:
+            if self._expired.pop(session_id, None):
+                self._sessions.pop(session_id, None)
+                return False
+            self._sessions[session_id] = {"seen": time.time(), "media": media, "files": files}
+        store = _store()
+        if store:
+            for media_id in media.values():
+                store.pin(media_id, session_id)
+        render_cache = sys.modules.get("render_cache")
+        if render_cache:
+            for path in files:
+                render_cache.pin(path, session_id)
+        _unpin(session_id, media.values(), files)
+        return True
+
+    def forget(self, session_id):
+        """Stop tracking a session, releasing its pins"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        _unpin(session_id)
+
+    def enforce(self, force=False):
+        """Reclaim idle sessions, then offload the coldest ones while over budget
+
+        Runs at most every ENFORCE_SECONDS unless force is set.
+        """
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_enforce < ENFORCE_SECONDS:
+                return
+            self._last_enforce = now
+            idle = [sid for sid, s in self._sessions.items() if now - s["seen"] > self.idle_seconds]
+            for sid in [sid for sid, at in self._expired.items() if now - at > self.idle_seconds]:
+                del self._expired[sid]
+            for sid in idle:
+                self._expired[sid] = now
+            reclaimed = [self._sessions.pop(sid) for sid in idle]
+            self.reclaimed += len(idle)
+            sessions = sorted(self._sessions.values(), key=lambda s: s["seen"])
+
+        for sid in idle:
+            _unpin(sid)
+        live = {(kind, media_id) for s in sessions for kind, media_id in s["media"].items()}
+        for session in reclaimed:
+            for kind, media_id in session["media"].items():
+                # Another live session may share the same upload
+                if (kind, media_id) not in live:
+                    _offload(kind, media_id)
+
+        total = sum(_resident_bytes(kind, media_id) for kind, media_id in live)
+        # Coldest first; the most recently active session is never offloaded
+        for n, session in enumerate(sessions[:-1]):
+            if total <= self.budget_bytes:
+                break
+            warmer = {(k, m) for s in sessions[n + 1:] for k, m in s["media"].items()}
+            freed = sum(_offload(kind, media_id) for kind, media_id in session["media"].items()
+                        if (kind, media_id) not in warmer)
+            if freed:
+                total -= freed
+                with self._lock:
+                    self.offloads += 1
+                    self.offloaded_bytes += freed
+
+    def stats(self):
+        """Counters for the admin panel plus one row per live session, most recent first"""
+        now = time.time()
+        with self._lock:
+            sessions = dict(self._sessions)
+            counters = {"offloads": self.offloads, "offloaded_bytes": self.offloaded_bytes,
+                        "reclaimed": self.reclaimed}
+        store = _store()
+        rows = []
+        seen = set()
+        resident_total = 0
+        for sid, session in sorted(sessions.items(), key=lambda item: -item[1]["seen"]):
+            resident = 0
+            for kind, media_id in session["media"].items():
+                held = _resident_bytes(kind, media_id)
+                resident += held
+                if (kind, media_id) not in seen:
+                    seen.add((kind, media_id))
+                    resident_total += held
+            disk = sum(_file_bytes(path) for path in session["files"])
+            if store:
+                disk += sum(_file_bytes(os.path.join(store.directory, media_id))
+                            for media_id in session["media"].values())
+            rows.append({"session": sid[:8], "idle_seconds": round(now - session["seen"], 1),
+                         "resident_bytes": resident, "disk_bytes": disk})
+        counters.update({
+            "sessions": len(rows),
+            "resident_bytes": resident_total,
+            "budget_bytes": self.budget_bytes,
+            "idle_seconds": self.idle_seconds,
+            "disk_bytes": sum(row["disk_bytes"] for row in rows),
+            "per_session": rows,
+        })
+        return counters
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_session_governor():
+    """Process-wide SessionGovernor"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = SessionGovernor()
+        return _governor
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_services import MockServices  # noqa: E402
+
+
+@pytest.fixture
+def mock():
+    services = MockServices().start()
+    yield services
+    services.stop()
@@ -0,0 +1,157 @@
+"""Local stand-ins for the OpenAI and YouTube endpoints.
+
+``MockServices`` is a local HTTP server speaking just enough of the chat
+completions and resumable upload protocols, with configurable response
+latency. ``MockServices.fail`` injects errors and stalls, which the tests
+use to exercise retries, timeouts and resumed uploads; ``loadtest.py`` runs its sessions
+against the same server.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_SEO = ("TITLE: Load test mix\n"
+            "DESCRIPTION: A generated track used to load test the video pipeline.\n"
+            "TAGS: load test, music, visualizer")
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=()):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _drain(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        while length:
+            length -= len(self.rfile.read(min(length, 1024 * 1024)))
+
+    def _fault(self, name):
+        """Apply the next injected fault for name; True if it answered the request"""
+        fault = self.server.mock.next_fault(name)
+        if fault is None:
+            return False
+        time.sleep(fault["delay"])
+        if fault["status"] is None:
+            return False
+        headers = [("Retry-After", fault["retry_after"])] if fault["retry_after"] is not None else []
+        self._send(fault["status"], {"error": "injected"} if fault["status"] != 308 else None, headers)
+        return True
+
+    def do_POST(self):
+        mock = self.server.mock
+        if self.path.endswith("/chat/completions"):
+            self._drain()
+            mock.count("openai")
+            if self._fault("openai"):
+                return
+            time.sleep(mock.openai_latency)
+            self._send(200, {"choices": [{"message": {"role": "assistant", "content": MOCK_SEO}}]})
+        elif self.path.startswith("/upload/youtube/v3/videos"):
+            self._drain()
+            mock.count("youtube_sessions")
+            if self._fault("youtube_sessions"):
+                return
+            time.sleep(mock.youtube_latency)
+            session_id = mock.open_upload(int(self.headers.get("X-Upload-Content-Length") or 0))
+            self._send(200, {}, [("Location", f"{mock.url}/upload/session/{session_id}")])
+        else:
+            self._drain()
+            self._send(404, {"error": "not found"})
+
+    def do_PUT(self):
+        mock = self.server.mock
+        session_id = self.path.rsplit("/", 1)[-1]
+        total = mock.uploads.get(session_id)
+        content_range = self.headers.get("Content-Range", "")
+        self._drain()
+        if total is None or not content_range.startswith("bytes "):
+            self._send(404, {"error": "unknown upload session"})
+            return
+        span, _, _ = content_range[6:].partition("/")
+        received = mock.received.get(session_id, 0)
+        if span != "*":
+            mock.count("youtube_chunks")
+            if self._fault("youtube_chunks"):
+                # The chunk is lost, as if the connection dropped mid-transfer
+                return
+            received = int(span.split("-")[1]) + 1
+            mock.received[session_id] = received
+        if received >= total:
+            self._send(200, {"id": f"mock_{session_id[:11]}", "status": {"uploadStatus": "uploaded"}})
+        elif received:
+            self._send(308, None, [("Range", f"bytes=0-{received - 1}")])
+        else:
+            self._send(308)
+
+
+class MockServices:
+    """Local stand-in for the OpenAI chat completions and YouTube resumable upload endpoints"""
+
+    def __init__(self, openai_latency=0.0, youtube_latency=0.0):
+        self.openai_latency = openai_latency
+        self.youtube_latency = youtube_latency
+        self.uploads = {}
+        self.received = {}
+        self.requests = {}
+        self._faults = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _MockHandler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-services",
+                                        daemon=True)
+
+    def count(self, name):
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+
+    def fail(self, name, status=503, times=1, retry_after=None, delay=0.0):
+        """Make the next times requests to name fail
+
+        name is "openai", "youtube_sessions" or "youtube_chunks". Each one
+        waits delay seconds, then answers with status (and a Retry-After
+        header if given); status None only delays the normal answer.
+        """
+        fault = {"status": status, "retry_after": retry_after, "delay": delay}
+        with self._lock:
+            self._faults.setdefault(name, []).extend([fault] * times)
+
+    def next_fault(self, name):
+        with self._lock:
+            faults = self._faults.get(name)
+            return faults.pop(0) if faults else None
+
+    def open_upload(self, total):
+        session_id = uuid.uuid4().hex
+        self.uploads[session_id] = total
+        return session_id
+
+    def environment(self):
+        """Environment variables pointing the app's clients at this server"""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "YOUTUBE_UPLOAD_URL": f"{self.url}/upload/youtube/v3/videos",
+        }
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from audio_analysis import SAMPLE_RATE, analyze_stream
+
+SECONDS = 3.0
+
+
+@pytest.fixture(scope="module")
+def samples():
+    t = np.arange(int(SECONDS * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t)
+    # A click every half second gives the beat grid something to find
+    clicks = (t % 0.5 < 0.01) * np.random.default_rng(0).uniform(-1, 1, len(t))
+    return (tone + clicks).astype(np.float32)
+
+
+def blocks(samples, size):
+    return [samples[i:i + size] for i in range(0, len(samples), size)]
+
+
+@pytest.mark.parametrize("fps", [10, 30])
+@pytest.mark.parametrize("block", [7, 1000, 4096, 22050, 100000])
+def test_streaming_matches_one_block(samples, fps, block):
+    whole = analyze_stream([samples], SAMPLE_RATE, fps)
+    streamed = analyze_stream(blocks(samples, block), SAMPLE_RATE, fps)
+    assert streamed.keys() == whole.keys()
+    for name, value in whole.items():
+        np.testing.assert_allclose(streamed[name], value, rtol=1e-6, atol=1e-6, err_msg=name)
+    assert len(whole["spectrum"]) == int(np.ceil(SECONDS * fps))
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from effects import EFFECT_RENDERERS, frame_random
+from renderer import build_context, effect_batches
+
+DURATION = 4.0
+FPS = 25
+
+
+@pytest.fixture(scope="module")
+def canvas():
+    return np.random.default_rng(0).integers(0, 256, (36, 64, 3), dtype=np.uint8)
+
+
+def render(canvas, effect_id, batch, start=0, stop=None):
+    ctx = build_context(effect_id, 70, DURATION, FPS)
+    return np.concatenate([frames for _, frames in
+                           effect_batches(canvas, effect_id, ctx, start, stop, batch)])
+
+
+def test_frame_random_depends_only_on_its_keys():
+    frames = np.arange(100)
+    whole = frame_random(7, frames, 3)
+    assert np.array_equal(np.concatenate([frame_random(7, frames[:40], 3),
+                                          frame_random(7, frames[40:], 3)]), whole)
+    assert not np.array_equal(frame_random(8, frames, 3), whole)
+    assert ((whole >= 0) & (whole < 1)).all()
+
+
+@pytest.mark.parametrize("effect_id", sorted(EFFECT_RENDERERS))
+def test_frames_do_not_depend_on_the_batch_size(canvas, effect_id):
+    assert np.array_equal(render(canvas, effect_id, 7), render(canvas, effect_id, 50))
+
+
+@pytest.mark.parametrize("effect_id", sorted(EFFECT_RENDERERS))
+def test_a_frame_range_matches_the_whole_render(canvas, effect_id):
+    whole = render(canvas, effect_id, 50)
+    assert np.array_equal(render(canvas, effect_id, 7, 33, 71), whole[33:71])
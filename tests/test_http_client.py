@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+import seo
+from http_client import HttpClient, HttpError
+from mock_services import MOCK_SEO
+from seo_cache import SeoCache
+
+PAYLOAD = {"messages": []}
+
+
+@pytest.fixture
+def client():
+    client = HttpClient(timeout=(1.0, 0.5), retries=2, backoff=0.01)
+    yield client
+    client.close()
+
+
+def chat_url(mock):
+    return f"{mock.url}/v1/chat/completions"
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_transient_statuses(mock, client, status):
+    mock.fail("openai", status, times=2)
+    result = client.post_json(chat_url(mock), PAYLOAD)
+    assert result["choices"][0]["message"]["content"] == MOCK_SEO
+    assert mock.requests["openai"] == 3
+
+
+def test_gives_up_after_the_last_retry(mock, client):
+    mock.fail("openai", 503, times=3)
+    with pytest.raises(HttpError) as error:
+        client.post_json(chat_url(mock), PAYLOAD)
+    assert error.value.status_code == 503
+    assert mock.requests["openai"] == 3
+
+
+def test_does_not_retry_client_errors(mock, client):
+    mock.fail("openai", 401)
+    with pytest.raises(HttpError) as error:
+        client.post_json(chat_url(mock), PAYLOAD)
+    assert error.value.status_code == 401
+    assert mock.requests["openai"] == 1
+
+
+def test_honours_retry_after(mock, client):
+    mock.fail("openai", 429, retry_after="0.3")
+    started = time.monotonic()
+    client.post_json(chat_url(mock), PAYLOAD)
+    assert time.monotonic() - started >= 0.3
+
+
+def test_retries_a_read_timeout(mock, client):
+    mock.fail("openai", None, delay=1.0)
+    assert client.post_json(chat_url(mock), PAYLOAD)["choices"]
+    assert mock.requests["openai"] == 2
+
+
+def test_read_timeouts_run_out_of_retries(mock, client):
+    mock.fail("openai", None, times=3, delay=1.0)
+    with pytest.raises(HttpError) as error:
+        client.post_json(chat_url(mock), PAYLOAD)
+    assert error.value.status_code is None
+
+
+def test_post_json_many_keeps_order_and_failures(mock, client):
+    mock.fail("openai", 400)
+    results = client.post_json_many(chat_url(mock), [PAYLOAD] * 4)
+    assert len(results) == 4
+    assert sum(isinstance(result, HttpError) for result in results) == 1
+    assert sum(isinstance(result, dict) for result in results) == 3
+
+
+def test_seo_variants_are_generated_and_cached(mock, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(seo, "OPENAI_URL", chat_url(mock))
+    cache = SeoCache(str(tmp_path))
+    variants = [("Song A", ""), ("Song B", "live")]
+    results = seo.request_seo_variants(variants, "key", client, cache)
+    assert results == [("Load test mix", "A generated track used to load test the video pipeline.",
+                        "load test, music, visualizer")] * 2
+    seo.request_seo_variants(variants, "key", client, cache)
+    assert mock.requests["openai"] == 2
+
+
+def test_unparseable_seo_is_a_failure_and_not_cached(mock, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(seo, "OPENAI_URL", chat_url(mock))
+    monkeypatch.setattr(seo, "_content", lambda result: "Sure! Here are some ideas.")
+    cache = SeoCache(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        seo.request_seo("Song", "", "key", client, cache)
+    assert seo.cached_seo("Song", "", cache) is None
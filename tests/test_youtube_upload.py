@@ -0,0 +1,72 @@
+import pytest
+
+import youtube_upload
+from youtube_upload import BandwidthLimiter, UploadError, upload_video
+
+CHUNK = youtube_upload.UPLOAD_GRANULARITY
+
+
+@pytest.fixture
+def upload(mock, tmp_path, monkeypatch):
+    monkeypatch.setattr(youtube_upload, "YOUTUBE_UPLOAD_URL", f"{mock.url}/upload/youtube/v3/videos")
+    monkeypatch.setattr(youtube_upload, "UPLOAD_STATE_DIR", str(tmp_path / "state"))
+    # No real backoff between retries
+    monkeypatch.setattr(youtube_upload.time, "sleep", lambda seconds: None)
+    video = tmp_path / "video.mp4"
+    video.write_bytes(bytes(range(256)) * (CHUNK * 3 // 256 + 100))
+
+    def run(**kwargs):
+        return upload_video(str(video), "Title", "Description", "a, b", token="token",
+                            chunk_bytes=CHUNK, limiter=BandwidthLimiter(0), **kwargs)
+
+    run.size = video.stat().st_size
+    return run
+
+
+def test_uploads_in_chunks(mock, upload):
+    seen = []
+    result = upload(progress=lambda sent, total, rate: seen.append(sent))
+    assert result["video_id"].startswith("mock_")
+    assert result["bytes"] == upload.size
+    assert mock.requests["youtube_chunks"] == 4
+    assert seen[-1] == upload.size
+
+
+def test_resumes_after_an_interrupted_chunk(mock, upload):
+    mock.fail("youtube_chunks", 503)
+    result = upload()
+    assert result["bytes"] == upload.size
+    assert mock.requests["youtube_sessions"] == 1
+    # Only the failed chunk is sent twice
+    assert mock.requests["youtube_chunks"] == 5
+
+
+def test_a_later_call_picks_up_the_saved_session(mock, upload):
+    interrupted = []
+
+    def interrupt(sent, total, rate):
+        if not interrupted:
+            interrupted.append(sent)
+            mock.fail("youtube_chunks", 503, times=youtube_upload.UPLOAD_RETRIES + 1)
+
+    with pytest.raises(UploadError):
+        upload(progress=interrupt)
+    result = upload()
+    assert result["bytes"] == upload.size
+    assert mock.requests["youtube_sessions"] == 1
+    # One chunk, the failed attempts at the second, then the last three
+    assert mock.requests["youtube_chunks"] == 1 + youtube_upload.UPLOAD_RETRIES + 1 + 3
+
+
+def test_a_308_without_progress_is_retried_then_fails(mock, upload):
+    mock.fail("youtube_chunks", 308, times=100)
+    with pytest.raises(UploadError):
+        upload()
+    assert mock.requests["youtube_chunks"] == youtube_upload.UPLOAD_RETRIES + 1
+
+
+def test_rejected_upload_is_not_retried(mock, upload):
+    mock.fail("youtube_chunks", 403)
+    with pytest.raises(UploadError):
+        upload()
+    assert mock.requests["youtube_chunks"] == 1
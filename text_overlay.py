@@ -0,0 +1,110 @@
+"""Text overlay compositing.
+
+The overlay string is rasterized once per process into an RGBA tile (white
+text with a dark outline) and memoized. Each frame then only needs a single
+alpha blend of that precomputed tile over the region it covers. Position
+and opacity are animated by keyframes, interpolated for a whole batch of
+frames at once.
+
+Keyframes are dicts {"t": seconds, "x": ..., "y": ..., "opacity": ...}
+where x and y place the centre of the text as fractions of the frame size.
+"""
+import functools
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_NAMES = ("DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf")
+# Text height relative to the frame, and the widest the text may get
+TEXT_HEIGHT = 1 / 12
+TEXT_MAX_WIDTH = 0.9
+FADE_SECONDS = 1.0
+
+
+def _font(px):
+    for name in FONT_NAMES:
+        try:
+            return ImageFont.truetype(name, px)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(px)
+    except TypeError:
+        # Pillow < 10.1 has a single fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=16)
+def text_tile(text, frame_width, frame_height):
+    """Premultiplied (rgb, alpha) float32 tile for text sized to the frame
+
+    rgb is (h, w, 3) already multiplied by alpha, alpha is (h, w, 1) in 0..1.
+    """
+    px = max(8, int(frame_height * TEXT_HEIGHT))
+    for _ in range(4):
+        font = _font(px)
+        stroke = max(1, px // 16)
+        left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox(
+            (0, 0), text, font=font, stroke_width=stroke
+        )
+        width, height = right - left, bottom - top
+        limit = int(frame_width * TEXT_MAX_WIDTH)
+        if width <= limit or px <= 8:
+            break
+        px = max(8, int(px * limit / width))
+
+    tile = Image.new("RGBA", (max(1, width), max(1, height)), (0, 0, 0, 0))
+    ImageDraw.Draw(tile).text((-left, -top), text, font=font, fill=(255, 255, 255, 255),
+                              stroke_width=stroke, stroke_fill=(0, 0, 0, 255))
+    rgba = np.asarray(tile, dtype=np.float32) / 255.0
+    # Crop to what the frame can hold
+    rgba = rgba[:frame_height, :frame_width]
+    alpha = rgba[..., 3:4]
+    rgb = rgba[..., :3] * 255.0 * alpha
+    rgb.flags.writeable = False
+    alpha.flags.writeable = False
+    return rgb, alpha
+
+
+def default_keyframes(duration):
+    """Lower-third title that rises in, holds, and fades out at the end"""
+    fade = min(FADE_SECONDS, duration / 4.0)
+    return [
+        {"t": 0.0, "x": 0.5, "y": 0.9, "opacity": 0.0},
+        {"t": fade, "x": 0.5, "y": 0.85, "opacity": 1.0},
+        {"t": duration - fade, "x": 0.5, "y": 0.85, "opacity": 1.0},
+        {"t": duration, "x": 0.5, "y": 0.85, "opacity": 0.0},
+    ]
+
+
+def interpolate_keyframes(keyframes, t):
+    """Linearly interpolate x, y and opacity for each time in t"""
+    keyframes = sorted(keyframes, key=lambda key: key["t"])
+    times = [key["t"] for key in keyframes]
+    return {
+        name: np.interp(t, times, [key[name] for key in keyframes]).astype(np.float32)
+        for name in ("x", "y", "opacity")
+    }
+
+
+def composite_text(frames, idx, ctx):
+    """Blend ctx["text_overlay"] onto a batch of frames in place and return it"""
+    n, h, w = frames.shape[:3]
+    rgb, alpha = text_tile(ctx["text_overlay"], w, h)
+    th, tw = alpha.shape[:2]
+    keyframes = ctx.get("text_keyframes") or default_keyframes(ctx["duration"])
+    track = interpolate_keyframes(keyframes, idx.astype(np.float32) / ctx["fps"])
+
+    # Top-left corners, kept inside the frame
+    xs = np.clip(np.round(track["x"] * w - tw / 2), 0, w - tw).astype(np.intp)
+    ys = np.clip(np.round(track["y"] * h - th / 2), 0, h - th).astype(np.intp)
+    for i in range(n):
+        opacity = track["opacity"][i]
+        if opacity <= 0.0:
+            continue
+        region = frames[i, ys[i]:ys[i] + th, xs[i]:xs[i] + tw]
+        # One blend per frame: out = tile * a + region * (1 - a)
+        a = alpha * opacity
+        blended = rgb * opacity + region * (1.0 - a)
+        region[...] = blended.astype(np.uint8)
+    return frames
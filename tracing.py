@@ -0,0 +1,133 @@
+"""Lightweight timing spans for the hot paths.
+
+``span("render.encode")`` times a block and records its duration under that
+stage name. When tracing is off (the default) ``span`` returns a shared
+no-op context manager after a single flag check, so instrumented code pays
+next to nothing. When it is on, every span is kept in a bounded per-stage
+window for the p50/p95 figures shown in the admin panel and, if
+YOUASSIST_TRACE_LOG is set, appended to that file as a JSON line.
+
+Durations measured elsewhere (for instance inside render worker processes)
+are added with ``record``.
+
+YOUASSIST_TRACE=1 turns tracing on at startup; ``set_enabled`` toggles it
+at runtime. One-off startup costs (first imports of heavy modules, time to
+first paint) happen before anyone can flip the switch, so ``mark_startup``
+keeps them regardless and ``startup`` returns them.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+TRACE_LOG = os.getenv("YOUASSIST_TRACE_LOG")
+# Recent durations kept per stage for the percentile figures
+TRACE_WINDOW = 1000
+
+# When this process first loaded the app, for time-to-first-paint
+PROCESS_STARTED = time.perf_counter()
+
+_enabled = os.getenv("YOUASSIST_TRACE", "") not in ("", "0")
+_durations = {}
+_startup = {}
+_lock = threading.Lock()
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+def record(name, seconds, **attrs):
+    """Add a duration measured by the caller"""
+    if not _enabled:
+        return
+    with _lock:
+        window = _durations.get(name)
+        if window is None:
+            window = _durations[name] = deque(maxlen=TRACE_WINDOW)
+        window.append(seconds)
+    if TRACE_LOG:
+        # Outside the lock, so spans finishing on other threads don't queue
+        # behind file I/O; each line goes out in one append-mode write
+        entry = {"ts": time.time(), "span": name, "seconds": round(seconds, 6)}
+        entry.update(attrs)
+        line = json.dumps(entry, default=str) + "\n"
+        with open(TRACE_LOG, "a") as f:
+            f.write(line)
+
+
+def mark_startup(name, seconds):
+    """Keep the first duration seen for a one-off startup stage, whether or not tracing is on"""
+    with _lock:
+        _startup.setdefault(name, seconds)
+    record(name, seconds)
+
+
+def startup():
+    """{stage: seconds} of the startup stages marked so far"""
+    with _lock:
+        return dict(_startup)
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "started")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        record(self.name, time.perf_counter() - self.started, **self.attrs)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **attrs):
+    """Context manager timing a block as stage name"""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, attrs)
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def stats():
+    """{stage: {"count", "p50", "p95", "max"}} in seconds over each stage's recent window"""
+    with _lock:
+        windows = {name: sorted(window) for name, window in _durations.items()}
+    return {
+        name: {"count": len(ordered), "p50": _percentile(ordered, 0.5),
+               "p95": _percentile(ordered, 0.95), "max": ordered[-1]}
+        for name, ordered in sorted(windows.items()) if ordered
+    }
+
+
+def reset():
+    with _lock:
+        _durations.clear()
@@ -1,24 +1,33 @@
+import time
+_script_started = time.perf_counter()
+
 import streamlit as st
 import os
+import sys
+import importlib
 import tempfile
-import time
-import base64
-import requests
-import json
-from PIL import Image
-import io
+import hmac
 import uuid
 
-# Set page configuration
-st.set_page_config(
-    page_title="Video Creator & YouTube Uploader",
-    page_icon="🎬",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+# Only light, standard-library-only modules are imported up front. The
+# render engine (NumPy, PIL), the job pipeline and the HTTP clients
+# (requests) load on first use through lazy_module, so the first paint
+# and every rerun that doesn't need them skip their import cost
+import tracing
+from encoders import DEFAULT_PRESET
+from seo_cache import get_seo_cache
+from session_governor import get_session_governor
+
+def lazy_module(name):
+    """Import a module on first use; the first import is timed as startup.import.<name>"""
+    module = sys.modules.get(name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        tracing.mark_startup(f"startup.import.{name}", time.perf_counter() - started)
+    return module
 
-# Custom CSS styling with animated effects
-st.markdown("""
+APP_CSS = """
 <style>
     .stAlert {
         border-radius: 10px;
@@ -101,23 +110,57 @@ st.markdown("""
         max-height: 50px;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Set page configuration
+st.set_page_config(
+    page_title="Video Creator & YouTube Uploader",
+    page_icon="🎬",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# Custom CSS styling with animated effects (a constant: nothing is built per rerun)
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# Initialize session state once per session
+SESSION_DEFAULTS = {
+    "video_url": None,
+    # Extra outputs of the last render (Short, thumbnail) by name
+    "render_outputs": None,
+    "current_step": 1,
+    "selected_effect": "glitch",
+    "show_login": False,
+    # Uploads live in the media store; sessions only keep small handles to them
+    "image_media": None,
+    "audio_media": None,
+    "api_authenticated": False,
+    "render_job": None,
+    "seo_job": None,
+    "upload_job": None,
+}
+_first_run = "session_started" not in st.session_state
+if _first_run:
+    for name, value in SESSION_DEFAULTS.items():
+        st.session_state.setdefault(name, value)
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.session_started = True
 
-# Initialize session state
-if "video_url" not in st.session_state:
-    st.session_state.video_url = None
-if "current_step" not in st.session_state:
-    st.session_state.current_step = 1
-if "selected_effect" not in st.session_state:
-    st.session_state.selected_effect = "glitch"
-if "show_login" not in st.session_state:
-    st.session_state.show_login = False
-if "image_bytes" not in st.session_state:
-    st.session_state.image_bytes = None
-if "audio_bytes" not in st.session_state:
-    st.session_state.audio_bytes = None
-if "api_authenticated" not in st.session_state:
-    st.session_state.api_authenticated = False
+def govern_session():
+    """Report this session's media to the process-wide governor; False if it was reclaimed"""
+    outputs = st.session_state.get("render_outputs") or {}
+    return get_session_governor().touch(
+        st.session_state.session_id,
+        {"image": st.session_state.image_media, "audio": st.session_state.audio_media},
+        [st.session_state.video_url] + list(outputs.values()),
+    )
+
+# Sessions left idle past the TTL have had their media released; start over
+if not govern_session():
+    for name in ("video_url", "render_outputs", "image_media", "audio_media", "current_step"):
+        st.session_state[name] = SESSION_DEFAULTS[name]
+    st.session_state.session_expired = True
+get_session_governor().enforce()
 
 # Function to create popup-like appearance
 def show_popup(title, content, type="info"):
@@ -139,6 +182,25 @@ def show_popup(title, content, type="info"):
         </div>
         """, unsafe_allow_html=True)
 
+def get_media_store():
+    return lazy_module("media_store").get_media_store()
+
+def store_upload(uploaded_file, current):
+    """Spool an upload to the media store once; reruns keep the existing handle"""
+    if current and current.get("upload_id") == uploaded_file.file_id and \
+            get_media_store().exists(current["id"]):
+        return current
+    with tracing.span("upload_media.spool", size=uploaded_file.size):
+        media = get_media_store().put(uploaded_file, uploaded_file.name)
+    media["upload_id"] = uploaded_file.file_id
+    return media
+
+def media_view(media):
+    """Memory-mapped bytes of a stored upload, or None if it is missing"""
+    if not media or not get_media_store().exists(media["id"]):
+        return None
+    return get_media_store().view(media["id"])
+
 # 1. MEDIA UPLOADER COMPONENT
 def upload_media():
     """Upload image and audio files"""
@@ -152,19 +214,15 @@ def upload_media():
         if uploaded_image is not None:
             st.success("✅ Image uploaded!")
             try:
-                img = Image.open(uploaded_image)
-                st.image(img, width=300)
-                # Store image bytes for later use
-                img_bytes = uploaded_image.getvalue()
-                st.session_state.image_bytes = img_bytes
-                # Convert image format if needed
-                if uploaded_image.name.lower().endswith(('.jpg', '.jpeg', '.png')):
-                    pass
-                else:
-                    # Ensure proper format
-                    buf = io.BytesIO()
-                    img.save(buf, format="JPEG")
-                    st.session_state.image_bytes = buf.getvalue()
+                st.session_state.image_media = store_upload(uploaded_image, st.session_state.image_media)
+                # One decode prepares the render canvases and the thumbnail
+                with tracing.span("upload_media.ingest"):
+                    lazy_module("renderer").ingest_image(
+                        media_view(st.session_state.image_media),
+                        thumbnails=[lazy_module("media_store").THUMBNAIL_SIZE]
+                    )
+                # A downscaled thumbnail instead of the full-size upload
+                st.image(get_media_store().thumbnail(st.session_state.image_media["id"]), width=300)
             except Exception as e:
                 st.error(f"Error processing image: {str(e)}")
     
@@ -175,16 +233,105 @@ def upload_media():
         if uploaded_audio is not None:
             st.success("✅ Audio uploaded!")
             st.audio(uploaded_audio)
-            # Store audio bytes
-            st.session_state.audio_bytes = uploaded_audio.getvalue()
+            st.session_state.audio_media = store_upload(uploaded_audio, st.session_state.audio_media)
+    
+    return st.session_state.image_media is not None, st.session_state.audio_media is not None
+
+# Process-wide render farm shared by every session
+@st.cache_resource
+def get_render_farm():
+    return lazy_module("render_farm").RenderFarm()
+
+# Process-wide background job queue (render, SEO and upload jobs)
+@st.cache_resource
+def get_job_queue():
+    return lazy_module("pipeline").create_job_queue(get_render_farm())
+
+def wait_for_job(job_id, running_text):
+    """Poll a background job until it finishes and return its final record"""
+    queue = get_job_queue()
+    cancel_slot = st.empty()
+    if cancel_slot.button("Cancel", key=f"cancel_{job_id}"):
+        queue.cancel(job_id)
+    progress_bar = st.progress(0)
+    status = st.empty()
+    job = queue.status(job_id)
+    while job and job["state"] in ("queued", "running"):
+        if job["state"] == "queued":
+            status.text("Waiting in the queue...")
+        else:
+            detail = f" ({job['message']})" if job.get("message") else ""
+            status.text(f"{running_text}: {int(job['progress'] * 100)}%{detail}")
+        progress_bar.progress(int(job["progress"] * 100))
+        # The script thread sits here for the whole job; keep the session live
+        govern_session()
+        time.sleep(0.25)
+        job = queue.status(job_id)
     
-    return st.session_state.image_bytes is not None, st.session_state.audio_bytes is not None
+    cancel_slot.empty()
+    status.empty()
+    if job is None:
+        st.error("Background job was lost. Please try again.")
+    elif job["state"] == "cancelled":
+        st.info("Cancelled.")
+    elif job["state"] == "done":
+        progress_bar.progress(100)
+    return job
+
+def collect_render():
+    """Wait for the session's render job and return the video path"""
+    job = wait_for_job(st.session_state.render_job, "Rendering")
+    st.session_state.render_job = None
+    if job is None or job["state"] != "done":
+        if job and job["state"] == "failed":
+            st.error(f"Error rendering video: {job['error']}")
+        return None
+    if job["result"]["cached"]:
+        st.caption("Reused an identical earlier render")
+    st.session_state.render_outputs = job["result"].get("outputs") or {}
+    return job["result"]["video_path"]
+
+def show_extra_outputs():
+    """Show the Short and thumbnail rendered alongside the video"""
+    outputs = st.session_state.get("render_outputs") or {}
+    if outputs.get("short"):
+        st.markdown("**YouTube Short (9:16)**")
+        st.video(outputs["short"])
+    if outputs.get("thumbnail"):
+        st.markdown("**Thumbnail**")
+        st.image(outputs["thumbnail"], width=320)
+
+def track_seconds():
+    """Length of the uploaded audio from its header, remembered per upload; None if unknown"""
+    media = st.session_state.get("audio_media")
+    if not media:
+        return None
+    cached = st.session_state.get("track_seconds")
+    if cached and cached[0] == media["id"]:
+        return cached[1]
+    try:
+        seconds = lazy_module("audio_analysis").probe_duration(media["path"])
+    except Exception:
+        seconds = None
+    st.session_state.track_seconds = (media["id"], seconds)
+    return seconds
+
+def render_duration():
+    """Seconds to render: the whole track, or the slider value cut to the track's length"""
+    track = track_seconds()
+    if track and st.session_state.get("full_track"):
+        return round(track, 2)
+    duration = st.session_state.get("effect_duration", 15)
+    return min(duration, round(track, 2)) if track else duration
 
 # 2. VIDEO PROCESSOR COMPONENT WITH AVEEPLAYER-LIKE FEATURES
 def create_video_with_effects():
     """Create video with AveePlyer-style effects"""
+    renderer = lazy_module("renderer")
     
-    if not st.session_state.get("image_bytes") or not st.session_state.get("audio_bytes"):
+    image_bytes = media_view(st.session_state.get("image_media"))
+    audio_bytes = media_view(st.session_state.get("audio_media"))
+    if image_bytes is None or audio_bytes is None:
         show_popup("Missing Files", "Please upload both image and audio files first.", "warning")
         return None
     
@@ -200,6 +347,18 @@ def create_video_with_effects():
         "spectrum": {"name": "Audio Spectrum", "desc": "Visualize audio frequencies"}
     }
     
+    # Low-resolution previews of every effect on the user's image, rendered in
+    # parallel and memoized by the render farm
+    try:
+        with tracing.span("create_video.previews"):
+            previews = get_render_farm().previews(
+                image_bytes, list(effects),
+                st.session_state.get("effect_intensity", 50)
+            )
+    except Exception as e:
+        st.warning(f"Effect previews unavailable: {str(e)}")
+        previews = {}
+    
     # Create columns for effect selection
     cols = st.columns(3)
     for i, (effect_id, effect) in enumerate(effects.items()):
@@ -212,12 +371,17 @@ def create_video_with_effects():
             <div class="{card_style}" id="{effect_id}-card">
                 <h4>{effect["name"]}</h4>
                 <p style="font-size: 0.8em; color: #666;">{effect["desc"]}</p>
+            </div>
+            """, unsafe_allow_html=True)
+            if effect_id in previews:
+                st.image(previews[effect_id])
+            else:
+                st.markdown("""
                 <div style="height: 60px; background: #f0f0f0; border-radius: 5px; 
                      display: flex; align-items: center; justify-content: center; margin-top: 10px;">
                     <span style="color: #888;">Effect Preview</span>
                 </div>
-            </div>
-            """, unsafe_allow_html=True)
+                """, unsafe_allow_html=True)
             
             # Add button with label (fixing the empty label warning)
             if st.button(f"Select {effect['name']}", key=f"effect_{effect_id}", help=f"Apply {effect['name']} to your video"):
@@ -226,31 +390,54 @@ def create_video_with_effects():
     
     st.markdown("---")
     
-    # Timeline editor (AveePlyer-style)
+    # Timeline editor (AveePlyer-style). Each segment is rendered and cached as
+    # its own chunk, so editing one segment only re-renders that part
     st.subheader("Video Timeline")
-    st.markdown("""
-    <div class="video-timeline">
-        <div class="timeline-segment" title="Introduction">
-            <span>Intro</span>
-        </div>
-        <div class="timeline-segment" title="Main Effect">
-            <span>Effect</span>
-        </div>
-        <div class="timeline-segment" title="Transition">
-            <span>Transition</span>
-        </div>
-        <div class="timeline-segment" title="Outro">
-            <span>Outro</span>
-        </div>
+    overrides = {}
+    if st.checkbox("Customize timeline segments", value=False, key="customize_timeline",
+                   help="Use a different effect or intensity for each part of the video"):
+        segment_cols = st.columns(len(renderer.TIMELINE_SEGMENTS))
+        effect_ids = list(effects)
+        for col, (name, _) in zip(segment_cols, renderer.TIMELINE_SEGMENTS):
+            with col:
+                segment_effect = st.selectbox(f"{name} effect", effect_ids,
+                                              index=effect_ids.index(st.session_state.selected_effect),
+                                              format_func=lambda e: effects[e]["name"],
+                                              key=f"segment_{name}_effect")
+                segment_intensity = st.slider(f"{name} intensity", min_value=0, max_value=100,
+                                              value=st.session_state.get("effect_intensity", 50),
+                                              key=f"segment_{name}_intensity")
+                overrides[name] = {"effect": segment_effect, "intensity": segment_intensity}
+    
+    timeline = renderer.build_timeline(st.session_state.selected_effect,
+                                       st.session_state.get("effect_intensity", 50),
+                                       render_duration(), overrides)
+    segments_html = "".join(f"""
+        <div class="timeline-segment" title="{segment['name']}" style="flex: {segment['stop'] - segment['start']} 1 0; color: #eee;">
+            <span>{segment['name']}<br><small>{segment['start']:.1f}-{segment['stop']:.1f}s &middot; {effects[segment['effect']]['name']}</small></span>
+        </div>""" for segment in timeline)
+    st.markdown(f"""
+    <div class="video-timeline">{segments_html}
     </div>
     """, unsafe_allow_html=True)
     
     # Advanced options
     with st.expander("Advanced Effects Settings"):
-        intensity = st.slider("Effect Intensity", min_value=0, max_value=100, value=50, 
+        intensity = st.slider("Effect Intensity", min_value=0, max_value=100, value=50, key="effect_intensity",
                              help="Adjust the intensity of the selected effect")
-        duration = st.slider("Effect Duration (seconds)", min_value=5, max_value=60, value=15,
-                           help="Set the duration of your video")
+        # Long mixes render at their full length: audio is analysed in
+        # streamed blocks, so memory stays flat however long the track is
+        track = track_seconds()
+        full_track = st.checkbox(
+            f"Use full track length ({int(track // 60)}:{int(track % 60):02d})" if track else "Use full track length",
+            value=False, key="full_track", disabled=not track,
+            help="Render the video for the whole length of your audio"
+        )
+        st.slider("Effect Duration (seconds)", min_value=5, max_value=60, value=15, key="effect_duration",
+                  disabled=full_track, help="Set the duration of your video")
+        duration = render_duration()
+        if track and not full_track and duration < st.session_state.effect_duration:
+            st.caption(f"Your audio is {track:.1f}s long, so the video will be too.")
         col1, col2 = st.columns(2)
         with col1:
             sync_to_audio = st.checkbox("Sync to Audio Beat", value=True,
@@ -259,68 +446,80 @@ def create_video_with_effects():
             add_text = st.checkbox("Add Text Overlay", value=False,
                                  help="Add text overlay to your video")
         
+        text_overlay = ""
         if add_text:
             text_overlay = st.text_input("Text Overlay", 
                                         help="Enter text to display on your video")
+        
+        # Draft renders are small and encoded with the fastest preset, for
+        # checking effects and timing before the full-quality render
+        draft = st.checkbox("Fast draft", value=False, key="draft_render",
+                            help="Quick low-resolution render to preview your settings")
+        
+        # Extra formats come out of the same render pass as the video
+        extra_outputs = st.multiselect("Also create", ["short", "thumbnail"], default=[],
+                                       format_func={"short": "YouTube Short (9:16)",
+                                                    "thumbnail": "Thumbnail"}.get,
+                                       key="extra_outputs",
+                                       help="Rendered together with the video, without re-running the effects. "
+                                            "The Short shows the square middle of the video with black "
+                                            "bars above and below, so the sides of a wide cover are cut off")
+    outputs = ["video"] + extra_outputs
+    size, preset = (renderer.DRAFT_SIZE, "draft") if draft else (renderer.DEFAULT_SIZE, DEFAULT_PRESET)
     
     # Process video button
     if st.button("Create Video", type="primary", use_container_width=True, help="Process and create your video"):
         with st.spinner("Creating your video with effects..."):
-            # Show processing interface
+            # Show processing interface; the input is a small thumbnail served
+            # by URL rather than the full image inlined as base64 on every rerun
             st.markdown("""
             <div class="processing-preview fadeIn">
                 <h4>Processing Video</h4>
                 <p>Applying selected effects and rendering your video...</p>
-                <div style="display: flex; margin: 20px 0;">
-                    <div style="flex: 1; text-align: center;">
-                        <p>Input Image</p>
-                        <div style="max-height: 150px; overflow: hidden; margin: 0 auto; width: 150px;">
-                            <img src="data:image/jpeg;base64,{}" alt="Input" style="width: 100%;">
-                        </div>
-                    </div>
-                    <div style="margin: 0 20px; display: flex; align-items: center;">➡️</div>
-                    <div style="flex: 1; text-align: center;">
-                        <p>Effect: {}</p>
-                        <div class="pulse" style="background-color: #eee; height: 150px; width: 150px; margin: 0 auto; 
-                             display: flex; align-items: center; justify-content: center;">
-                            <p>Processing...</p>
-                        </div>
-                    </div>
-                </div>
             </div>
-            """.format(
-                base64.b64encode(st.session_state.image_bytes).decode() if st.session_state.image_bytes else "",
-                effects[st.session_state.selected_effect]["name"]
-            ), unsafe_allow_html=True)
-            
-            # Simulate processing with progress bar
-            progress_bar = st.progress(0)
-            for i in range(101):
-                time.sleep(0.03)
-                progress_bar.progress(i)
-            
-            # For demonstration, use a sample video URL
-            # In a real app, this would be the output from a video processing service
-            sample_videos = {
-                "glitch": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4",
-                "zoom": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4",
-                "fade": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4",
-                "particles": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4",
-                "spectrum": "https://sample-videos.com/video123/mp4/720/big_buck_bunny_720p_1mb.mp4"
-            }
+            """, unsafe_allow_html=True)
+            input_col, arrow_col, effect_col = st.columns([2, 1, 2])
+            with input_col:
+                st.markdown('<p style="text-align: center;">Input Image</p>', unsafe_allow_html=True)
+                st.image(get_media_store().thumbnail(st.session_state.image_media["id"]), width=150)
+            with arrow_col:
+                st.markdown('<div style="margin-top: 70px; text-align: center;">➡️</div>', unsafe_allow_html=True)
+            with effect_col:
+                st.markdown("""
+                <p style="text-align: center;">Effect: {}</p>
+                <div class="pulse" style="background-color: #eee; height: 150px; width: 150px; margin: 0 auto; 
+                     display: flex; align-items: center; justify-content: center;">
+                    <p>Processing...</p>
+                </div>
+                """.format(effects[st.session_state.selected_effect]["name"]), unsafe_allow_html=True)
             
-            video_url = sample_videos.get(st.session_state.selected_effect, sample_videos["glitch"])
+            # Hand the render to the background job queue; progress is polled below.
+            # Clicking again while the same render is in flight reuses that job
+            timeline = renderer.build_timeline(st.session_state.selected_effect, intensity, duration, overrides)
+            with tracing.span("create_video.submit"):
+                params, key = lazy_module("pipeline").render_job(
+                    image_bytes, audio_bytes, st.session_state.selected_effect, intensity, duration,
+                    sync_to_audio, text_overlay, timeline, size, preset=preset, outputs=outputs,
+                    audio_path=st.session_state.audio_media["path"]
+                )
+                st.session_state.render_job = get_job_queue().submit("render", params, key=key)
+    
+    # Poll a running render; a rerun simply resumes polling the same job
+    if st.session_state.get("render_job"):
+        with tracing.span("create_video.wait"):
+            video_url = collect_render()
+        if video_url:
             st.session_state.video_url = video_url
-            
             st.success("✅ Video created successfully!")
             st.video(video_url)
-            
-            return video_url
+            show_extra_outputs()
+        return video_url
     
     # Show existing video if already created
     if st.session_state.video_url:
         st.subheader("Your Video")
         st.video(st.session_state.video_url)
+        show_extra_outputs()
         return st.session_state.video_url
             
     return None
@@ -343,93 +542,39 @@ def generate_seo(title, description):
         if not openai_api_key:
             st.warning("OpenAI API key not configured. Using sample SEO content instead.")
             # Return sample SEO content for demo
-            return (
-                f"🔥 {title} - Amazing Visual Experience",
-                f"{description}\n\nCheck out this amazing visual experience with stunning effects! Don't forget to like and subscribe for more content like this.",
-                "music video, visual effects, audio visualization, AveePlyer, cool effects, motion graphics"
-            )
+            return lazy_module("seo").sample_seo(title, description)
         
-        with st.spinner("Generating SEO content with AI..."):
-            # Prepare prompt
-            prompt = f"""
-            Create YouTube SEO content based on this video information:
-            
-            Video Title: {title}
-            Video Description: {description}
-            
-            The video has AveePlyer-style visual effects with music.
-            
-            Please provide:
-            1. A catchy, SEO-optimized title (max 70 characters)
-            2. A detailed description with relevant keywords (300-500 chars)
-            3. Ten relevant hashtags/tags (comma-separated)
-            
-            Format your response exactly as:
-            TITLE: [your title]
-            DESCRIPTION: [your description]
-            TAGS: [tag1], [tag2], [tag3], ...
-            """
-            
-            # Make request to OpenAI API
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {openai_api_key}"
-            }
-            
-            payload = {
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": "You are a YouTube SEO expert."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 500
-            }
-            
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                
-                # Parse response
-                lines = content.split('\n')
-                seo_title = ""
-                seo_description = ""
-                seo_tags = ""
-                
-                for line in lines:
-                    if line.startswith('TITLE:'):
-                        seo_title = line[6:].strip()
-                    elif line.startswith('DESCRIPTION:'):
-                        seo_description = line[12:].strip()
-                    elif line.startswith('TAGS:'):
-                        seo_tags = line[5:].strip()
-                
-                return seo_title, seo_description, seo_tags
-            else:
-                st.error(f"OpenAI API Error: {response.status_code}")
-                # Fallback to sample content
-                return (
-                    f"🔥 {title} - Amazing Visual Experience",
-                    f"{description}\n\nCheck out this amazing visual experience with stunning effects! Don't forget to like and subscribe for more content like this.",
-                    "music video, visual effects, audio visualization, AveePlyer, cool effects, motion graphics"
-                )
+        # Identical requests are answered straight from the SEO cache
+        with tracing.span("generate_seo.cache_lookup"):
+            cached = lazy_module("seo").cached_seo(title, description)
+        if cached:
+            return cached
+        
+        # Run the request as a background job; a duplicate click joins it
+        params, key = lazy_module("pipeline").seo_job(title, description, openai_api_key, lookup=False)
+        with tracing.span("generate_seo.request"):
+            st.session_state.seo_job = get_job_queue().submit("seo", params, key=key)
+            return collect_seo(title, description)
     except Exception as e:
         st.error(f"Error generating SEO content: {str(e)}")
         # Fallback content
-        return (
-            f"🔥 {title} - Amazing Visual Experience",
-            f"{description}\n\nCheck out this amazing visual experience with stunning effects! Don't forget to like and subscribe for more content like this.",
-            "music video, visual effects, audio visualization, AveePlyer, cool effects, motion graphics"
-        )
+        return lazy_module("seo").sample_seo(title, description)
+
+def collect_seo(title, description):
+    """Wait for the session's SEO job and return (title, description, tags)"""
+    with st.spinner("Generating SEO content with AI..."):
+        job = wait_for_job(st.session_state.seo_job, "Generating")
+    st.session_state.seo_job = None
+    if job and job["state"] == "done":
+        result = job["result"]
+        return result["title"], result["description"], result["tags"]
+    if job and job["state"] == "failed":
+        st.error(f"Error generating SEO content: {job['error']}")
+    # Fallback to sample content
+    return lazy_module("seo").sample_seo(title, description)
 
 # 4. YOUTUBE UPLOADER COMPONENT
-def upload_to_youtube(video_url, title, description, tags):
+def upload_to_youtube(video_url, title, description, tags, privacy="private"):
     """Upload video to YouTube using secure token"""
     try:
         # Get YouTube token from secrets
@@ -442,26 +587,98 @@ def upload_to_youtube(video_url, title, description, tags):
         if not youtube_token:
             show_popup("Demo Mode", "YouTube upload is in demo mode. In a real app, this would upload to your YouTube channel.", "info")
         
-        with st.spinner("Uploading to YouTube..."):
-            # Display upload progress
-            progress_bar = st.progress(0)
-            status = st.empty()
-            
-            for i in range(1, 101):
-                status.text(f"Uploading: {i}%")
-                progress_bar.progress(i)
-                time.sleep(0.03)
-            
-            # Simulate successful upload
-            video_id = f"demo_{uuid.uuid4().hex[:8]}"
-            mock_youtube_url = f"https://www.youtube.com/watch?v={video_id}"
-            
-            show_popup("Upload Successful", f"Video uploaded to YouTube! [View your video]({mock_youtube_url})", "success")
-            return True
+        # Uploads are idempotent: the same video and metadata is only ever uploaded once
+        # per account, so a finished upload is not handed back for another channel
+        params, key = lazy_module("pipeline").upload_job(video_url, title, description, tags,
+                                                          privacy, youtube_token)
+        with tracing.span("upload_to_youtube.upload"):
+            st.session_state.upload_job = get_job_queue().submit("upload", params, key=key,
+                                                                 reuse_done=True)
+            return collect_upload()
     except Exception as e:
         st.error(f"Error uploading to YouTube: {str(e)}")
         return False
 
+def collect_upload():
+    """Wait for the session's upload job and report the result"""
+    with st.spinner("Uploading to YouTube..."):
+        job = wait_for_job(st.session_state.upload_job, "Uploading")
+    st.session_state.upload_job = None
+    if job and job["state"] == "done":
+        show_popup("Upload Successful", f"Video uploaded to YouTube! [View your video]({job['result']['url']})", "success")
+        return True
+    if job and job["state"] == "failed":
+        st.error(f"Error uploading to YouTube: {job['error']}")
+    return False
+
+def admin_secret():
+    """Password unlocking the admin panel; without one the panel is not offered"""
+    try:
+        return st.secrets["admin_password"]
+    except:
+        return os.getenv("YOUASSIST_ADMIN_PASSWORD")
+
+def is_admin():
+    """Whether this session has entered the admin password"""
+    secret = admin_secret()
+    if not secret:
+        return False
+    entered = st.text_input("Admin password", type="password", key="admin_password")
+    return bool(entered) and hmac.compare_digest(entered.encode(), secret.encode())
+
+def show_admin_panel():
+    """Cache and session memory usage, startup costs, tracing switch and p50/p95 latency per stage"""
+    # Render cache usage, to help size YOUASSIST_RENDER_CACHE_MB. Only read
+    # here, so ordinary reruns never load the render farm just for a caption
+    cache_stats = get_render_farm().cache.stats()
+    st.caption(
+        f"Render cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+        f"{cache_stats['bytes'] / 1024 / 1024:.0f} of {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB"
+    )
+    seo_stats = get_seo_cache().stats()
+    st.caption(
+        f"SEO cache: {seo_stats['memory_hits'] + seo_stats['disk_hits']} hits "
+        f"({seo_stats['disk_hits']} from disk) / {seo_stats['misses']} misses, "
+        f"{seo_stats['disk_entries']} entries"
+    )
+    
+    # Media held per session, and what the governor offloaded or reclaimed
+    governor = get_session_governor().stats()
+    st.caption(
+        f"Sessions: {governor['sessions']} live, {governor['resident_bytes'] / 1024 / 1024:.0f} of "
+        f"{governor['budget_bytes'] / 1024 / 1024:.0f} MB in memory, "
+        f"{governor['disk_bytes'] / 1024 / 1024:.0f} MB on disk; "
+        f"{governor['offloads']} offloads ({governor['offloaded_bytes'] / 1024 / 1024:.0f} MB), "
+        f"{governor['reclaimed']} idle sessions reclaimed"
+    )
+    if governor["per_session"]:
+        st.dataframe([
+            {"session": row["session"], "idle s": row["idle_seconds"],
+             "memory MB": round(row["resident_bytes"] / 1024 / 1024, 1),
+             "disk MB": round(row["disk_bytes"] / 1024 / 1024, 1)}
+            for row in governor["per_session"]
+        ], use_container_width=True)
+    
+    # First paint of the process and first imports of the heavy modules
+    startup = tracing.startup()
+    if startup:
+        st.caption("  \n".join(f"{name}: {seconds * 1000:.0f} ms" for name, seconds in startup.items()))
+    
+    enabled = st.checkbox("Record timings", value=tracing.enabled(), key="tracing_enabled")
+    if enabled != tracing.enabled():
+        tracing.set_enabled(enabled)
+    stage_stats = tracing.stats()
+    if not stage_stats:
+        st.caption("No timings recorded yet." if enabled else "Timing is off.")
+        return
+    st.dataframe([
+        {"stage": name, "count": s["count"], "p50 ms": round(s["p50"] * 1000, 1),
+         "p95 ms": round(s["p95"] * 1000, 1)}
+        for name, s in stage_stats.items()
+    ], use_container_width=True)
+    if st.button("Reset timings"):
+        tracing.reset()
+
 # MAIN APP
 def main():
     # App header with logo
@@ -470,6 +687,9 @@ def main():
     st.write("Create stunning music visualization videos and upload to YouTube")
     st.markdown('</div>', unsafe_allow_html=True)
     
+    if st.session_state.pop("session_expired", False):
+        st.info("This session was idle for a while and its files were released. Please upload them again.")
+    
     # Sidebar
     with st.sidebar:
         st.header("Navigation")
@@ -493,6 +713,12 @@ def main():
         # App information
         st.markdown("---")
         st.info("👋 This app creates music visualization videos with effects similar to AveePlyer.")
+        
+        # Optional per-stage latency panel for diagnosing slow sessions. It
+        # switches tracing for the whole process and lists every session, so
+        # it is only offered when an admin password is configured
+        if admin_secret() and st.checkbox("Admin panel", key="admin_panel") and is_admin():
+            show_admin_panel()
     
     # Content based on selected step
     if st.session_state.current_step == 1:
@@ -511,7 +737,7 @@ def main():
         st.header("Step 2: Create Video with Effects")
         
         # Check if we have media files
-        if "image_bytes" not in st.session_state or "audio_bytes" not in st.session_state:
+        if not st.session_state.get("image_media") or not st.session_state.get("audio_media"):
             st.warning("Please upload image and audio files first.")
             if st.button("Go Back to Media Upload", help="Return to upload media"):
                 st.session_state.current_step = 1
@@ -553,9 +779,15 @@ def main():
                 st.video(st.session_state.video_url)
             
             # Generate SEO button
+            seo_result = None
             if st.button("Generate SEO Content with AI", help="Use AI to generate optimized titles and descriptions"):
-                seo_title, seo_description, seo_tags = generate_seo(video_title, video_description)
-                
+                seo_result = generate_seo(video_title, video_description)
+            elif st.session_state.seo_job:
+                # Resume waiting for a generation interrupted by a rerun
+                seo_result = collect_seo(video_title, video_description)
+            
+            if seo_result:
+                seo_title, seo_description, seo_tags = seo_result
                 if seo_title and seo_description and seo_tags:
                     st.session_state.seo_title = seo_title
                     st.session_state.seo_description = seo_description
@@ -614,7 +846,20 @@ def main():
             
             # Upload button
             if st.button("Upload to YouTube", help="Upload your video to YouTube"):
-                upload_to_youtube(st.session_state.video_url, title, description, tags)
+                upload_to_youtube(st.session_state.video_url, title, description, tags, privacy)
+            elif st.session_state.upload_job:
+                # Resume waiting for an upload interrupted by a rerun
+                collect_upload()
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Pick up media uploaded or rendered during this rerun
+        govern_session()
+        # Whole-script time of this rerun; a session's first run is its time to first paint
+        elapsed = time.perf_counter() - _script_started
+        tracing.record("app.rerun", elapsed, first=_first_run)
+        if _first_run:
+            tracing.record("app.first_paint", elapsed)
+            tracing.mark_startup("startup.first_paint", time.perf_counter() - tracing.PROCESS_STARTED)
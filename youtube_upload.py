@@ -0,0 +1,291 @@
+"""Resumable YouTube uploads.
+
+Implements the YouTube Data API resumable upload protocol: a POST with the
+video metadata opens an upload session, then the file is streamed from disk
+in fixed-size chunks with ``Content-Range`` PUTs. The session URL and the
+last byte the server acknowledged are saved to a small JSON state file, so
+an upload interrupted by a network error or a server restart resumes where
+it stopped instead of starting over. A process-wide token bucket caps the
+combined bandwidth of all concurrent uploads.
+
+Kept free of Streamlit calls so it can run in a background job. Set
+YOUTUBE_UPLOAD_URL to a local fake endpoint to test without YouTube.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+from http_client import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, get_client
+
+YOUTUBE_UPLOAD_URL = os.getenv("YOUTUBE_UPLOAD_URL", "https://www.googleapis.com/upload/youtube/v3/videos")
+UPLOAD_STATE_DIR = os.getenv(
+    "YOUASSIST_UPLOAD_STATE_DIR", os.path.join(tempfile.gettempdir(), "youassist_cache", "uploads")
+)
+# Chunks must be a multiple of 256 KiB for every chunk but the last
+UPLOAD_GRANULARITY = 256 * 1024
+UPLOAD_CHUNK_BYTES = max(1, int(os.getenv("YOUASSIST_UPLOAD_CHUNK_MB", "8"))) * 1024 * 1024
+# Combined bandwidth cap for all uploads in this process, 0 for unlimited
+UPLOAD_BANDWIDTH = int(os.getenv("YOUASSIST_UPLOAD_KBPS", "0")) * 1024
+UPLOAD_RETRIES = 5
+# Size of the blocks handed to the socket while streaming a chunk
+STREAM_BLOCK_BYTES = 64 * 1024
+# YouTube category "Music"
+MUSIC_CATEGORY = "10"
+
+
+class UploadError(RuntimeError):
+    """The upload was rejected or could not be completed"""
+
+
+class BandwidthLimiter:
+    """Token bucket shared by every upload in the process"""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n):
+        """Block until n bytes may be sent"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            # Allow at most one second of burst
+            self._tokens = min(self.rate, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+_limiter = BandwidthLimiter(UPLOAD_BANDWIDTH)
+
+
+def upload_key(video_path, title, description, tags, privacy):
+    """Identifies an upload so an interrupted one can be found again
+
+    Rendered videos live at content-addressed paths whose mtime is bumped on
+    every cache hit, so only the path and size identify the file.
+    """
+    parts = [os.path.abspath(video_path), os.path.getsize(video_path), title, description, tags, privacy]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+def _state_path(key):
+    return os.path.join(UPLOAD_STATE_DIR, f"{key}.json")
+
+
+def _load_state(key):
+    try:
+        with open(_state_path(key)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_state(key, state):
+    os.makedirs(UPLOAD_STATE_DIR, exist_ok=True)
+    path = _state_path(key)
+    with open(f"{path}.part", "w") as f:
+        json.dump(state, f)
+    os.replace(f"{path}.part", path)
+
+
+def _clear_state(key):
+    try:
+        os.remove(_state_path(key))
+    except FileNotFoundError:
+        pass
+
+
+def _metadata(title, description, tags, privacy):
+    return {
+        "snippet": {
+            "title": title,
+            "description": description,
+            "tags": [tag.strip() for tag in (tags or "").split(",") if tag.strip()],
+            "categoryId": MUSIC_CATEGORY,
+        },
+        "status": {"privacyStatus": privacy},
+    }
+
+
+def _read_blocks(path, start, length, limiter):
+    """Stream length bytes of the file from start, paced by the bandwidth limiter"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining:
+            block = f.read(min(STREAM_BLOCK_BYTES, remaining))
+            if not block:
+                raise UploadError("Video file changed while uploading")
+            limiter.acquire(len(block))
+            remaining -= len(block)
+            yield block
+
+
+def _acknowledged(response):
+    """Offset of the next byte to send, from a 308 response's Range header"""
+    value = response.headers.get("Range")
+    if not value:
+        return 0
+    return int(value.rsplit("-", 1)[1]) + 1
+
+
+def _open_session(session, token, total, metadata):
+    response = session.post(
+        YOUTUBE_UPLOAD_URL,
+        params={"uploadType": "resumable", "part": "snippet,status"},
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=UTF-8",
+            "X-Upload-Content-Length": str(total),
+            "X-Upload-Content-Type": "video/mp4",
+        },
+        json=metadata,
+        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    )
+    if response.status_code != 200 or "Location" not in response.headers:
+        raise UploadError(f"Could not start upload: HTTP {response.status_code}")
+    return response.headers["Location"]
+
+
+def _query_offset(session, token, session_url, total):
+    """Ask the server how much of the file it already has
+
+    Returns the next offset, the finished video resource, or None when the
+    session has expired.
+    """
+    response = session.put(
+        session_url,
+        headers={"Authorization": f"Bearer {token}", "Content-Range": f"bytes */{total}",
+                 "Content-Length": "0"},
+        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    )
+    if response.status_code in (200, 201):
+        return response.json()
+    if response.status_code == 308:
+        return _acknowledged(response)
+    if response.status_code in (404, 410):
+        return None
+    raise UploadError(f"Could not resume upload: HTTP {response.status_code}")
+
+
+def _result(resource, total, sent, started):
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return {
+        "video_id": resource["id"],
+        "url": f"https://www.youtube.com/watch?v={resource['id']}",
+        "bytes": total,
+        "seconds": elapsed,
+        "bytes_per_second": sent / elapsed,
+    }
+
+
+def _demo_upload(video_path, progress, limiter):
+    """Without a token: stream the file locally so progress and throughput are real"""
+    total = os.path.getsize(video_path)
+    started = time.monotonic()
+    sent = 0
+    for block in _read_blocks(video_path, 0, total, limiter):
+        sent += len(block)
+        if progress:
+            progress(sent, total, sent / max(time.monotonic() - started, 1e-6))
+    return _result({"id": f"demo_{uuid.uuid4().hex[:8]}"}, total, sent, started)
+
+
+def upload_video(video_path, title, description, tags, privacy="private", token=None,
+                 progress=None, chunk_bytes=UPLOAD_CHUNK_BYTES, limiter=None):
+    """Upload a rendered video; returns {"video_id", "url", "bytes", "seconds", "bytes_per_second"}
+
+    progress is called as progress(bytes_acknowledged, total_bytes, bytes_per_second).
+    Without a token this runs in demo mode and returns a mock video id.
+    """
+    limiter = limiter or _limiter
+    if not token:
+        return _demo_upload(video_path, progress, limiter)
+
+    chunk_bytes = max(UPLOAD_GRANULARITY, chunk_bytes // UPLOAD_GRANULARITY * UPLOAD_GRANULARITY)
+    session = get_client().session
+    total = os.path.getsize(video_path)
+    key = upload_key(video_path, title, description, tags, privacy)
+    started = time.monotonic()
+    sent = 0
+
+    state = _load_state(key)
+    offset = 0
+    if state:
+        resumed = _query_offset(session, token, state["session_url"], total)
+        if isinstance(resumed, dict):
+            _clear_state(key)
+            return _result(resumed, total, sent, started)
+        if resumed is None:
+            state = None
+        else:
+            offset = resumed
+    if not state:
+        state = {"session_url": _open_session(session, token, total,
+                                              _metadata(title, description, tags, privacy))}
+        _save_state(key, state)
+
+    failures = 0
+    while True:
+        length = min(chunk_bytes, total - offset)
+        try:
+            response = session.put(
+                state["session_url"],
+                data=_read_blocks(video_path, offset, length, limiter),
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Length": str(length),
+                    "Content-Range": f"bytes {offset}-{offset + length - 1}/{total}",
+                },
+                timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            response = None
+
+        if response is not None and response.status_code in (200, 201):
+            _clear_state(key)
+            sent += length
+            if progress:
+                progress(total, total, sent / max(time.monotonic() - started, 1e-6))
+            return _result(response.json(), total, sent, started)
+        if response is not None and response.status_code == 308:
+            acknowledged = _acknowledged(response)
+            if acknowledged > offset:
+                sent += acknowledged - offset
+                offset = acknowledged
+                failures = 0
+                state["offset"] = offset
+                _save_state(key, state)
+                if progress:
+                    progress(offset, total, sent / max(time.monotonic() - started, 1e-6))
+                continue
+            # The server kept nothing of this chunk: retry it like a failed one
+        elif response is not None and response.status_code < 500:
+            _clear_state(key)
+            raise UploadError(f"Upload rejected: HTTP {response.status_code}")
+
+        # Server error or dropped connection: back off, then ask where to resume
+        failures += 1
+        if failures > UPLOAD_RETRIES:
+            raise UploadError("Upload failed after several retries; it will resume on the next attempt")
+        time.sleep(min(2 ** failures, 30))
+        resumed = _query_offset(session, token, state["session_url"], total)
+        if isinstance(resumed, dict):
+            _clear_state(key)
+            return _result(resumed, total, sent, started)
+        if resumed is None:
+            _clear_state(key)
+            raise UploadError("Upload session expired; please upload again")
+        offset = resumed